@@ -5,7 +5,7 @@ Entry point with Pyrogram client and scheduler
 
 import asyncio
 import logging
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
 from pyrogram.types import Message
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from config import (
@@ -13,10 +13,19 @@ from config import (
     AMANBOTZ_API_ID,
     AMANBOTZ_API_HASH,
     AMANBOTZ_CHECK_INTERVAL,
-    check_api_config
+    AMANBOTZ_API_CACHE_PERSIST,
+    AMANBOTZ_POSTER_POOL_REFRESH,
+    AMANBOTZ_WORKER_ID,
+    AMANBOTZ_WORKER_ONLY,
+    check_api_config,
+    check_db_config
 )
 from database import amanbotz_db
 from api import amanbotz_api
+from poster_pool import amanbotz_poster_pool
+from poster_files import amanbotz_poster_files
+from broadcaster import amanbotz_broadcasts, amanbotz_shard_worker, SHARDING_ENABLED
+from plugins.auto_poster import iter_unposted_releases
 
 # Setup logging
 logging.basicConfig(
@@ -25,21 +34,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Validate API configuration
+# Validate API and database configuration
 try:
     check_api_config()
+    check_db_config()
 except ValueError as e:
     logger.error(str(e))
     exit(1)
 
 # Create Pyrogram Client
-amanbotz_client = Client(
-    "amanbotz_poster_bot",
-    api_id=AMANBOTZ_API_ID,
-    api_hash=AMANBOTZ_API_HASH,
-    bot_token=AMANBOTZ_BOT_TOKEN,
-    plugins=dict(root="plugins")
-)
+if AMANBOTZ_WORKER_ONLY:
+    # Extra session of the same bot that only sends broadcast shards (updates go to the main process)
+    amanbotz_client = Client(
+        f"amanbotz_worker_{AMANBOTZ_WORKER_ID}",
+        api_id=AMANBOTZ_API_ID,
+        api_hash=AMANBOTZ_API_HASH,
+        bot_token=AMANBOTZ_BOT_TOKEN,
+        in_memory=True,
+        no_updates=True
+    )
+else:
+    amanbotz_client = Client(
+        "amanbotz_poster_bot",
+        api_id=AMANBOTZ_API_ID,
+        api_hash=AMANBOTZ_API_HASH,
+        bot_token=AMANBOTZ_BOT_TOKEN,
+        plugins=dict(root="plugins")
+    )
 
 # Create Scheduler
 amanbotz_scheduler = AsyncIOScheduler()
@@ -60,19 +81,12 @@ async def auto_post_new_releases():
             return
         
         logger.info("Checking for new releases...")
-        releases = await amanbotz_api.get_new_releases()
-        
-        if not releases:
-            logger.info("No new releases found or API not available")
-            return
         
         from script import AMANBOTZ_AUTO_POST_MESSAGE
         
-        for release in releases:
-            # Check if already posted
-            if await amanbotz_db.is_movie_posted(release["id"]):
-                continue
-            
+        # Start posting as soon as the first page arrives,
+        # checking each page against posted movies in one query
+        async for release in iter_unposted_releases():
             # Skip if no poster
             if not release.get("poster"):
                 continue
@@ -88,9 +102,10 @@ async def auto_post_new_releases():
                 )
                 
                 # Send the poster to channel
-                await amanbotz_client.send_photo(
+                await amanbotz_poster_files.send_poster(
+                    amanbotz_client.send_photo,
+                    release["poster"],
                     chat_id=channel_id,
-                    photo=release["poster"],
                     caption=message,
                     parse_mode="HTML"
                 )
@@ -121,6 +136,21 @@ async def start_scheduler():
         id="auto_post_job",
         replace_existing=True
     )
+    amanbotz_scheduler.add_job(
+        amanbotz_poster_pool.refresh,
+        "interval",
+        minutes=AMANBOTZ_POSTER_POOL_REFRESH,
+        id="poster_pool_job",
+        replace_existing=True
+    )
+    if AMANBOTZ_STATS_RECOUNT_HOURS > 0:
+        amanbotz_scheduler.add_job(
+            amanbotz_db.recount_stats,
+            "interval",
+            hours=AMANBOTZ_STATS_RECOUNT_HOURS,
+            id="stats_recount_job",
+            replace_existing=True
+        )
     amanbotz_scheduler.start()
     logger.info(f"Scheduler started - checking every {AMANBOTZ_CHECK_INTERVAL} hours")
 
@@ -132,6 +162,38 @@ async def main():
     # Start the bot
     await amanbotz_client.start()
     
+    # Create indexes and run pending migrations
+    await amanbotz_db.setup_schema()
+    
+    # Load ban/admin lists and settings into memory
+    await amanbotz_db.start_sync()
+    
+    # Write user registrations in batches
+    amanbotz_db.start_write_behind()
+    
+    # Lease and send shards of sharded broadcasts
+    if SHARDING_ENABLED:
+        amanbotz_shard_worker.start(amanbotz_client)
+    
+    if AMANBOTZ_WORKER_ONLY:
+        if not SHARDING_ENABLED:
+            logger.warning("Worker-only mode has nothing to do without sharded broadcasts")
+        logger.info(f"Broadcast worker {AMANBOTZ_WORKER_ID} is running!")
+        try:
+            await idle()
+        finally:
+            await shutdown()
+        return
+    
+    # Open pooled HTTP sessions and the response cache for the movie APIs
+    await amanbotz_api.start(cache_store=amanbotz_db if AMANBOTZ_API_CACHE_PERSIST else None)
+    
+    # Fill the featured poster pool in the background
+    asyncio.create_task(amanbotz_poster_pool.refresh())
+    
+    # Pick up broadcasts interrupted by the last shutdown
+    await amanbotz_broadcasts.resume_unfinished(amanbotz_client)
+    
     # Start the scheduler
     await start_scheduler()
     
@@ -140,8 +202,26 @@ async def main():
     
     logger.info("Bot is running!")
     
-    # Keep alive
-    await asyncio.Event().wait()
+    # Keep alive until SIGINT/SIGTERM
+    try:
+        await idle()
+    finally:
+        await shutdown()
+
+
+async def shutdown():
+    """Stop background work and release connections"""
+    logger.info("Shutting down...")
+    if amanbotz_scheduler.running:
+        amanbotz_scheduler.shutdown(wait=False)
+    await amanbotz_shard_worker.stop()
+    await amanbotz_broadcasts.stop()
+    await amanbotz_api.close()
+    await amanbotz_db.stop_sync()
+    await amanbotz_db.stop_write_behind()
+    await amanbotz_db.close()
+    if amanbotz_client.is_connected:
+        await amanbotz_client.stop()
 
 
 if __name__ == "__main__":
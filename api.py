@@ -4,8 +4,81 @@ Supports both TMDB and OMDB APIs (optional - at least one required)
 """
 
 import aiohttp
+import asyncio
+import functools
+import inspect
+import logging
 import random
-from config import AMANBOTZ_TMDB_API, AMANBOTZ_OMDB_API, get_available_api
+import time
+from email.utils import parsedate_to_datetime
+from breaker import AmanbotzCircuitBreaker
+from cache import AmanbotzTTLCache
+from ratelimit import AmanbotzTokenBucket
+from config import (
+    AMANBOTZ_TMDB_API,
+    AMANBOTZ_OMDB_API,
+    AMANBOTZ_HTTP_POOL_LIMIT,
+    AMANBOTZ_HTTP_PER_HOST_LIMIT,
+    AMANBOTZ_HTTP_TIMEOUT,
+    AMANBOTZ_HTTP_CONNECT_TIMEOUT,
+    AMANBOTZ_HTTP_KEEPALIVE,
+    AMANBOTZ_HTTP_DNS_TTL,
+    AMANBOTZ_API_CACHE_SIZE,
+    AMANBOTZ_API_CACHE_MAX_MB,
+    AMANBOTZ_API_CACHE_DETAILS_TTL,
+    AMANBOTZ_API_CACHE_SEARCH_TTL,
+    AMANBOTZ_SEARCH_MODE,
+    AMANBOTZ_SEARCH_HEDGE_MS,
+    AMANBOTZ_RELEASE_PAGES,
+    AMANBOTZ_RELEASE_CONCURRENCY,
+    AMANBOTZ_OMDB_RATE,
+    AMANBOTZ_TMDB_RATE,
+    AMANBOTZ_API_MAX_RETRIES,
+    AMANBOTZ_API_MAX_RETRY_WAIT,
+    AMANBOTZ_BREAKER_FAILURES,
+    AMANBOTZ_BREAKER_SLOW_MS,
+    AMANBOTZ_BREAKER_COOLDOWN,
+    get_available_api
+)
+
+logger = logging.getLogger(__name__)
+
+
+def make_request_key(prefix: str, signature, args, kwargs):
+    """Build a normalized key from a method's prefix and arguments"""
+    bound = signature.bind(*args, **kwargs)
+    parts = [
+        f"{name}={' '.join(str(value).split()).lower()}"
+        for name, value in bound.arguments.items()
+        if name != "self" and value is not None
+    ]
+    return f"{prefix}:{'|'.join(parts)}"
+
+
+def cached_response(prefix: str, ttl: int):
+    """Serve a method's result from the response cache, keyed by its arguments"""
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = make_request_key(prefix, signature, (self, *args), kwargs)
+            return await self._cached(key, ttl, func, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def single_flight(prefix: str):
+    """Share one upstream call between concurrent identical calls"""
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = make_request_key(prefix, signature, (self, *args), kwargs)
+            return await self._single_flight(key, func, self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class AmanbotzMovieAPI:
@@ -14,45 +87,263 @@ class AmanbotzMovieAPI:
         self.tmdb_image_base = "https://image.tmdb.org/t/p/original"
         self.omdb_base = "http://www.omdbapi.com/"
         self.available_apis = get_available_api()
+        
+        # One long-lived session (and connection pool) per provider
+        self.sessions = {}
+        
+        # Per-provider request rate limits
+        self.limiters = {
+            "omdb": AmanbotzTokenBucket(AMANBOTZ_OMDB_RATE),
+            "tmdb": AmanbotzTokenBucket(AMANBOTZ_TMDB_RATE)
+        }
+        
+        # Per-provider health tracking
+        self.breakers = {
+            provider: AmanbotzCircuitBreaker(
+                provider,
+                failure_threshold=AMANBOTZ_BREAKER_FAILURES,
+                slow_threshold=AMANBOTZ_BREAKER_SLOW_MS / 1000,
+                cooldown=AMANBOTZ_BREAKER_COOLDOWN
+            )
+            for provider in ("omdb", "tmdb")
+        }
+        
+        # Response cache: in-memory LRU in front of an optional MongoDB store
+        self.cache = AmanbotzTTLCache(
+            max_entries=AMANBOTZ_API_CACHE_SIZE,
+            max_bytes=AMANBOTZ_API_CACHE_MAX_MB * 1024 * 1024,
+            default_ttl=AMANBOTZ_API_CACHE_SEARCH_TTL
+        )
+        self.cache_store = None
+        self.store_hits = 0
+        self.store_misses = 0
+        self._background_tasks = set()
+        
+        # In-flight upstream calls, keyed by normalized request
+        self._inflight = {}
+        self.coalesced_calls = 0
+    
+    # ============ Session Management ============
+    def _create_session(self):
+        """Create a pooled keep-alive session"""
+        connector = aiohttp.TCPConnector(
+            limit=AMANBOTZ_HTTP_POOL_LIMIT,
+            limit_per_host=AMANBOTZ_HTTP_PER_HOST_LIMIT,
+            keepalive_timeout=AMANBOTZ_HTTP_KEEPALIVE,
+            ttl_dns_cache=AMANBOTZ_HTTP_DNS_TTL,
+            use_dns_cache=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=AMANBOTZ_HTTP_TIMEOUT,
+            connect=AMANBOTZ_HTTP_CONNECT_TIMEOUT
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+    
+    def _get_session(self, provider: str):
+        """Get the shared session for a provider, creating it if needed"""
+        session = self.sessions.get(provider)
+        if session is None or session.closed:
+            session = self._create_session()
+            self.sessions[provider] = session
+        return session
+    
+    async def start(self, cache_store=None):
+        """Open sessions for all configured providers"""
+        for provider in self.available_apis:
+            self._get_session(provider)
+        
+        if cache_store:
+            try:
+                await cache_store.setup_api_cache()
+                self.cache_store = cache_store
+            except Exception as e:
+                logger.error(f"API cache store unavailable: {e}")
+    
+    async def close(self):
+        """Close all provider sessions"""
+        for session in self.sessions.values():
+            if not session.closed:
+                await session.close()
+        self.sessions.clear()
+        
+        # Let pending cache writes finish
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
+    
+    async def _get_json(self, provider: str, url: str, params: dict):
+        """GET a JSON document using the provider's shared session"""
+        session = self._get_session(provider)
+        limiter = self.limiters[provider]
+        breaker = self.breakers[provider]
+        
+        for attempt in range(AMANBOTZ_API_MAX_RETRIES + 1):
+            # Fail fast while the provider is tripped, without queueing
+            if not breaker.allow_request():
+                return None
+            
+            try:
+                # Queue no longer than a Retry-After we would wait for, then let the caller fail over
+                if await limiter.acquire(max_wait=AMANBOTZ_API_MAX_RETRY_WAIT) is None:
+                    breaker.release()
+                    logger.warning(f"{provider} rate limit queue is full, skipping")
+                    return None
+                started = time.monotonic()
+                async with session.get(url, params=params) as resp:
+                    if resp.status == 429:
+                        breaker.release()
+                        retry_after = self._parse_retry_after(resp.headers.get("Retry-After"))
+                        logger.warning(f"{provider} rate limited us (Retry-After: {retry_after})")
+                        if retry_after and retry_after > AMANBOTZ_API_MAX_RETRY_WAIT:
+                            # Too long to block the queue for: skip the provider until then instead
+                            breaker.trip(retry_after)
+                            return None
+                        limiter.on_throttled(retry_after)
+                        continue
+                    
+                    if resp.status >= 500:
+                        breaker.record_failure()
+                        logger.warning(f"{provider} returned HTTP {resp.status}")
+                        return None
+                    
+                    data = await resp.json() if resp.status == 200 else None
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                breaker.record_failure()
+                logger.warning(f"{provider} request failed: {e!r}")
+                return None
+            
+            breaker.record_success(time.monotonic() - started)
+            limiter.on_success()
+            return data
+        return None
+    
+    @staticmethod
+    def _parse_retry_after(value: str):
+        """Parse a Retry-After header into seconds"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def get_rate_limit_stats(self):
+        """Get queue depth and wait times per provider"""
+        return {provider: limiter.stats() for provider, limiter in self.limiters.items()}
+    
+    def get_health_stats(self):
+        """Get breaker state and latency percentiles per configured provider"""
+        return {provider: self.breakers[provider].stats() for provider in self.available_apis}
+    
+    def _providers_by_health(self):
+        """Available providers, healthy ones first (keeps OMDB preference)"""
+        return sorted(self.available_apis, key=lambda provider: self.breakers[provider].is_open())
+    
+    # ============ Response Cache ============
+    async def _cached(self, key: str, ttl: int, func, *args, **kwargs):
+        """Look up memory, then the persistent store, then call upstream"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        
+        if self.cache_store:
+            try:
+                value = await self.cache_store.get_api_cache(key)
+            except Exception as e:
+                logger.warning(f"API cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.store_hits += 1
+                self.cache.set(key, value, ttl)
+                return value
+            self.store_misses += 1
+        
+        value = await func(*args, **kwargs)
+        
+        # Only cache real answers, never errors or empty results
+        if value:
+            self.cache.set(key, value, ttl)
+            if self.cache_store:
+                task = asyncio.create_task(self._persist(key, value, ttl))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+        return value
+    
+    async def _persist(self, key: str, value, ttl: int):
+        """Write a response to the persistent store"""
+        try:
+            await self.cache_store.set_api_cache(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"API cache write failed: {e}")
+    
+    def get_cache_stats(self):
+        """Get response cache counters"""
+        stats = self.cache.stats()
+        stats["store_hits"] = self.store_hits
+        stats["store_misses"] = self.store_misses
+        stats["coalesced_calls"] = self.coalesced_calls
+        stats["inflight"] = len(self._inflight)
+        return stats
+    
+    # ============ Request Coalescing ============
+    async def _single_flight(self, key: str, func, *args, **kwargs):
+        """Join an identical in-flight call, or start one"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            
+            def _forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+            
+            task.add_done_callback(_forget)
+        else:
+            self.coalesced_calls += 1
+        
+        # Shield so one cancelled caller doesn't cancel the shared call
+        return await asyncio.shield(task)
     
     # ============ OMDB API Methods ============
+    @cached_response("omdb:search", AMANBOTZ_API_CACHE_SEARCH_TTL)
     async def omdb_search(self, query: str):
         """Search for a movie using OMDB API"""
         if not AMANBOTZ_OMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            params = {
-                "apikey": AMANBOTZ_OMDB_API,
-                "s": query,
-                "type": "movie"
-            }
-            async with session.get(self.omdb_base, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get("Response") == "True":
-                        return data.get("Search", [])
+        params = {
+            "apikey": AMANBOTZ_OMDB_API,
+            "s": query,
+            "type": "movie"
+        }
+        data = await self._get_json("omdb", self.omdb_base, params)
+        if data and data.get("Response") == "True":
+            return data.get("Search", [])
         return None
     
+    @cached_response("omdb:movie", AMANBOTZ_API_CACHE_DETAILS_TTL)
     async def omdb_get_movie(self, imdb_id: str = None, title: str = None):
         """Get movie details from OMDB"""
         if not AMANBOTZ_OMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            params = {"apikey": AMANBOTZ_OMDB_API, "plot": "full"}
-            if imdb_id:
-                params["i"] = imdb_id
-            elif title:
-                params["t"] = title
-            else:
-                return None
-            
-            async with session.get(self.omdb_base, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get("Response") == "True":
-                        return data
+        params = {"apikey": AMANBOTZ_OMDB_API, "plot": "full"}
+        if imdb_id:
+            params["i"] = imdb_id
+        elif title:
+            params["t"] = title
+        else:
+            return None
+        
+        data = await self._get_json("omdb", self.omdb_base, params)
+        if data and data.get("Response") == "True":
+            return data
         return None
     
     async def omdb_get_random_movie(self):
@@ -73,62 +364,54 @@ class AmanbotzMovieAPI:
         return await self.omdb_get_movie(imdb_id=random_id)
     
     # ============ TMDB API Methods ============
+    @cached_response("tmdb:search", AMANBOTZ_API_CACHE_SEARCH_TTL)
     async def tmdb_search(self, query: str):
         """Search for a movie using TMDB API"""
         if not AMANBOTZ_TMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.tmdb_base}/search/movie"
-            params = {
-                "api_key": AMANBOTZ_TMDB_API,
-                "query": query
-            }
-            async with session.get(url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("results", [])
+        url = f"{self.tmdb_base}/search/movie"
+        params = {
+            "api_key": AMANBOTZ_TMDB_API,
+            "query": query
+        }
+        data = await self._get_json("tmdb", url, params)
+        if data:
+            return data.get("results", [])
         return None
     
+    @cached_response("tmdb:movie", AMANBOTZ_API_CACHE_DETAILS_TTL)
     async def tmdb_get_movie(self, movie_id: int):
         """Get movie details from TMDB"""
         if not AMANBOTZ_TMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.tmdb_base}/movie/{movie_id}"
-            params = {"api_key": AMANBOTZ_TMDB_API}
-            async with session.get(url, params=params) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-        return None
+        url = f"{self.tmdb_base}/movie/{movie_id}"
+        params = {"api_key": AMANBOTZ_TMDB_API}
+        return await self._get_json("tmdb", url, params)
     
-    async def tmdb_get_new_releases(self):
+    async def tmdb_get_new_releases(self, page: int = 1):
         """Get new movie releases from TMDB"""
         if not AMANBOTZ_TMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.tmdb_base}/movie/now_playing"
-            params = {"api_key": AMANBOTZ_TMDB_API}
-            async with session.get(url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("results", [])
+        url = f"{self.tmdb_base}/movie/now_playing"
+        params = {"api_key": AMANBOTZ_TMDB_API, "page": page}
+        data = await self._get_json("tmdb", url, params)
+        if data:
+            return data.get("results", [])
         return None
     
-    async def tmdb_get_tv_releases(self):
+    async def tmdb_get_tv_releases(self, page: int = 1):
         """Get new TV series releases from TMDB"""
         if not AMANBOTZ_TMDB_API:
             return None
         
-        async with aiohttp.ClientSession() as session:
-            url = f"{self.tmdb_base}/tv/on_the_air"
-            params = {"api_key": AMANBOTZ_TMDB_API}
-            async with session.get(url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data.get("results", [])
+        url = f"{self.tmdb_base}/tv/on_the_air"
+        params = {"api_key": AMANBOTZ_TMDB_API, "page": page}
+        data = await self._get_json("tmdb", url, params)
+        if data:
+            return data.get("results", [])
         return None
     
     def get_tmdb_poster_url(self, poster_path: str):
@@ -138,22 +421,66 @@ class AmanbotzMovieAPI:
         return None
     
     # ============ Combined Methods ============
+    @single_flight("search")
     async def search_movie(self, query: str):
         """Search for a movie using available API"""
-        # Prefer OMDB if available
-        if "omdb" in self.available_apis:
-            results = await self.omdb_search(query)
-            if results:
-                return {"source": "omdb", "results": results}
+        if AMANBOTZ_SEARCH_MODE == "hedged" and len(self.available_apis) > 1:
+            return await self._hedged_search(query)
         
-        # Fall back to TMDB
-        if "tmdb" in self.available_apis:
-            results = await self.tmdb_search(query)
+        # Prefer OMDB, falling back to TMDB (tripped providers go last)
+        for provider in self._providers_by_health():
+            results = await self._provider_search(provider, query)
             if results:
-                return {"source": "tmdb", "results": results}
+                return {"source": provider, "results": results}
         
         return None
     
+    async def _provider_search(self, provider: str, query: str):
+        """Search a single provider"""
+        if provider == "omdb":
+            return await self.omdb_search(query)
+        return await self.tmdb_search(query)
+    
+    async def _hedged_search(self, query: str):
+        """Search all providers at once, preferring the first healthy one"""
+        providers = self._providers_by_health()
+        preferred = providers[0]
+        tasks = {
+            asyncio.ensure_future(self._provider_search(provider, query)): provider
+            for provider in providers
+        }
+        
+        def _result(task):
+            if task.cancelled() or task.exception():
+                return None
+            return task.result()
+        
+        try:
+            # Give the preferred provider a head start
+            preferred_task = next(t for t, p in tasks.items() if p == preferred)
+            await asyncio.wait({preferred_task}, timeout=AMANBOTZ_SEARCH_HEDGE_MS / 1000)
+            
+            pending = set(tasks)
+            while pending:
+                if preferred_task.done() and _result(preferred_task):
+                    return {"source": preferred, "results": preferred_task.result()}
+                
+                for task in pending:
+                    if task.done() and _result(task):
+                        return {"source": tasks[task], "results": task.result()}
+                
+                pending = {t for t in pending if not t.done()}
+                if pending:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            
+            return None
+        finally:
+            # Cancel the loser
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @single_flight("details")
     async def get_movie_details(self, movie_id: str = None, title: str = None, source: str = None):
         """Get movie details from available API"""
         # If source is specified, use that API
@@ -173,6 +500,13 @@ class AmanbotzMovieAPI:
         
         return None
     
+    async def prefetch_movie_details(self, movie_id: str, source: str):
+        """Warm the details cache, yielding to interactive traffic"""
+        # Skip while real users are queued on this provider or it is tripped
+        if self.limiters[source].waiting or self.breakers[source].is_open():
+            return None
+        return await self.get_movie_details(movie_id=movie_id, source=source)
+    
     async def get_random_poster(self):
         """Get a random movie poster for start page"""
         if "omdb" in self.available_apis:
@@ -201,40 +535,80 @@ class AmanbotzMovieAPI:
         
         return None
     
+    @single_flight("releases")
     async def get_new_releases(self):
         """Get new movie and TV releases"""
-        releases = []
+        return [release async for release in self.iter_new_releases()]
+    
+    async def iter_new_releases(self, pages: int = None):
+        """Yield new movie and TV releases as each TMDB page arrives"""
+        async for page in self.iter_new_release_pages(pages):
+            for release in page:
+                yield release
+    
+    async def iter_new_release_pages(self, pages: int = None):
+        """Yield lists of new movie and TV releases, one per TMDB page, as they arrive"""
+        if "tmdb" not in self.available_apis:
+            return
         
-        if "tmdb" in self.available_apis:
-            movies = await self.tmdb_get_new_releases()
-            if movies:
-                for movie in movies:
-                    releases.append({
-                        "id": str(movie.get("id")),
-                        "title": movie.get("title"),
-                        "type": "movie",
-                        "poster": self.get_tmdb_poster_url(movie.get("poster_path")),
-                        "release_date": movie.get("release_date"),
-                        "overview": movie.get("overview"),
-                        "rating": movie.get("vote_average"),
-                        "source": "tmdb"
-                    })
-            
-            tv_shows = await self.tmdb_get_tv_releases()
-            if tv_shows:
-                for show in tv_shows:
-                    releases.append({
-                        "id": str(show.get("id")),
-                        "title": show.get("name"),
-                        "type": "tv",
-                        "poster": self.get_tmdb_poster_url(show.get("poster_path")),
-                        "release_date": show.get("first_air_date"),
-                        "overview": show.get("overview"),
-                        "rating": show.get("vote_average"),
-                        "source": "tmdb"
-                    })
-        
-        return releases
+        pages = pages or AMANBOTZ_RELEASE_PAGES
+        semaphore = asyncio.Semaphore(AMANBOTZ_RELEASE_CONCURRENCY)
+        
+        async def fetch_page(release_type: str, page: int):
+            async with semaphore:
+                try:
+                    if release_type == "movie":
+                        items = await self.tmdb_get_new_releases(page=page)
+                    else:
+                        items = await self.tmdb_get_tv_releases(page=page)
+                except Exception as e:
+                    logger.error(f"Error fetching {release_type} releases page {page}: {e}")
+                    items = None
+                return release_type, items or []
+        
+        tasks = [
+            asyncio.ensure_future(fetch_page(release_type, page))
+            for page in range(1, pages + 1)
+            for release_type in ("movie", "tv")
+        ]
+        seen = set()
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                release_type, items = await next_page
+                releases = []
+                for item in items:
+                    release = self.format_release_tmdb(item, release_type)
+                    # Pages can overlap while TMDB reshuffles its lists
+                    if (release_type, release["id"]) in seen:
+                        continue
+                    seen.add((release_type, release["id"]))
+                    releases.append(release)
+                if releases:
+                    yield releases
+        finally:
+            # Consumer stopped early
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def format_release_tmdb(self, item: dict, release_type: str):
+        """Format a TMDB now playing / on the air entry"""
+        if release_type == "movie":
+            title = item.get("title")
+            release_date = item.get("release_date")
+        else:
+            title = item.get("name")
+            release_date = item.get("first_air_date")
+        return {
+            "id": str(item.get("id")),
+            "title": title,
+            "type": release_type,
+            "poster": self.get_tmdb_poster_url(item.get("poster_path")),
+            "release_date": release_date,
+            "overview": item.get("overview"),
+            "rating": item.get("vote_average"),
+            "source": "tmdb"
+        }
     
     def format_movie_details_omdb(self, movie: dict):
         """Format OMDB movie details for display"""
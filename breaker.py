@@ -0,0 +1,119 @@
+"""
+Circuit Breaker for Poster Bot
+Tracks provider health and stops calling a provider while it is failing
+"""
+
+import time
+from collections import deque
+
+
+class AmanbotzCircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, slow_threshold: float = 3.0,
+                 cooldown: float = 30.0, window: int = 200):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.cooldown = cooldown
+        
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        
+        # Recent successful call latencies (seconds)
+        self.latencies = deque(maxlen=window)
+        
+        # Counters
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.trips = 0
+    
+    def is_open(self):
+        """Check if the breaker is refusing calls (without using up a trial)"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at < self.cooldown
+        if self.state == self.HALF_OPEN:
+            return self._trial_in_flight
+        return False
+    
+    def allow_request(self):
+        """Check if a call may go through, claiming the half-open trial"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                return False
+            self._trial_in_flight = True
+        
+        return True
+    
+    def record_success(self, latency: float):
+        """Record a finished call; slow calls count as failures"""
+        self.latencies.append(latency)
+        if latency > self.slow_threshold:
+            self.record_failure()
+            return
+        
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        self.state = self.CLOSED
+    
+    def record_failure(self):
+        """Record a failed call and trip if needed"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def trip(self, duration: float = None):
+        """Open the breaker right away, for duration seconds (default: the cooldown)"""
+        if self.state != self.OPEN:
+            self.trips += 1
+        self.state = self.OPEN
+        self._trial_in_flight = False
+        self.opened_at = time.monotonic() + (duration - self.cooldown if duration else 0)
+    
+    def release(self):
+        """Give back a half-open trial that never completed"""
+        self._trial_in_flight = False
+    
+    def percentile(self, pct: float):
+        """Get a latency percentile in milliseconds"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return round(ordered[index] * 1000)
+    
+    def stats(self):
+        """Get breaker state and latency percentiles"""
+        state = self.state
+        if state == self.OPEN and not self.is_open():
+            state = self.HALF_OPEN
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "trips": self.trips,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99)
+        }
@@ -0,0 +1,777 @@
+"""
+Broadcast Engine for Poster Bot
+Sends a message to a stream of users with concurrent, rate-limited senders
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated
+from ratelimit import AmanbotzTokenBucket
+from progress import AmanbotzProgressReporter
+from database import amanbotz_db
+from database_base import AmanbotzShardingMixin
+from config import (
+    AMANBOTZ_BROADCAST_RATE,
+    AMANBOTZ_BROADCAST_WORKERS,
+    AMANBOTZ_BROADCAST_RETRIES,
+    AMANBOTZ_BROADCAST_CHECKPOINT,
+    AMANBOTZ_BROADCAST_MAX_JOBS,
+    AMANBOTZ_BROADCAST_SHARD_SIZE,
+    AMANBOTZ_BROADCAST_LEASE,
+    AMANBOTZ_WORKER_ID
+)
+from script import (
+    AMANBOTZ_BROADCAST_PROGRESS,
+    AMANBOTZ_BROADCAST_COMPLETE,
+    AMANBOTZ_BROADCAST_CANCELLED,
+    AMANBOTZ_BROADCAST_FAILED
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AmanbotzBroadcast:
+    def __init__(self, send, user_ids, limiter: AmanbotzTokenBucket, workers: int = 10,
+                 max_retries: int = 3, on_dead=None, on_checkpoint=None, checkpoint_every: int = 500):
+        self.send = send
+        self.user_ids = user_ids
+        self.limiter = limiter
+        self.workers = workers
+        self.max_retries = max_retries
+        self.on_dead = on_dead
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_every = checkpoint_every
+        
+        # Bounded so the user stream is only read as fast as we send
+        self._queue = asyncio.Queue(maxsize=workers * 4)
+        self._retry_tasks = set()
+        
+        # User IDs in stream order, popped once everything before them is done
+        self._fed = deque()
+        # Finished user ID -> True if sent, until the checkpoint passes it
+        self._done = {}
+        self.checkpoint = None
+        # Counters up to the checkpoint, saved with it so a resume never counts a user twice
+        self.checkpoint_sent = 0
+        self.checkpoint_failed = 0
+        self._checkpoint_due = asyncio.Event()
+        self._checkpointed_at = 0
+        
+        # Counters
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self.retried = 0
+        self.started_at = None
+        self.finished_at = None
+        self._processed_at_start = 0
+        
+        # Cleared while paused; senders wait on it before each message
+        self._unpaused = asyncio.Event()
+        self._unpaused.set()
+        self._paused_at = None
+        self._paused_time = 0.0
+    
+    @property
+    def processed(self):
+        return self.sent + self.failed
+    
+    @property
+    def paused(self):
+        return not self._unpaused.is_set()
+    
+    async def wait_unpaused(self):
+        """Wait until the broadcast is not paused"""
+        await self._unpaused.wait()
+    
+    def pause(self):
+        """Stop sending after the messages already in flight"""
+        if not self.paused:
+            self._unpaused.clear()
+            self._paused_at = time.monotonic()
+    
+    def resume(self):
+        """Continue sending"""
+        if self.paused:
+            self._unpaused.set()
+            if self.started_at:
+                self._paused_time += time.monotonic() - max(self._paused_at, self.started_at)
+            self._paused_at = None
+    
+    def rate(self):
+        """Messages processed per second so far, not counting time paused"""
+        if not self.started_at:
+            return 0.0
+        now = self.finished_at or time.monotonic()
+        elapsed = now - self.started_at - self._paused_time
+        if self.paused:
+            elapsed -= now - max(self._paused_at, self.started_at)
+        return (self.processed - self._processed_at_start) / elapsed if elapsed > 0 else 0.0
+    
+    def restore(self, checkpoint, sent: int, failed: int):
+        """Continue after a saved checkpoint and the counters saved with it"""
+        self.checkpoint = checkpoint
+        self.sent = self.checkpoint_sent = sent
+        self.failed = self.checkpoint_failed = failed
+    
+    def stats(self):
+        """Get broadcast counters and throughput"""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "dead": self.dead,
+            "retried": self.retried,
+            "rate": round(self.rate(), 1),
+            "checkpoint": self.checkpoint
+        }
+    
+    async def run(self):
+        """Send to every user in the stream and wait until all are done"""
+        self.started_at = time.monotonic()
+        self._processed_at_start = self._checkpointed_at = self.processed
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.on_checkpoint:
+            workers.append(asyncio.create_task(self._checkpoint_loop()))
+        try:
+            await self._feed()
+            # Also waits for FloodWait retries, which stay unfinished until re-sent
+            await self._queue.join()
+        finally:
+            for task in workers + list(self._retry_tasks):
+                task.cancel()
+            await asyncio.gather(*workers, *self._retry_tasks, return_exceptions=True)
+            self.finished_at = time.monotonic()
+        return self.stats()
+    
+    async def _feed(self):
+        async for user_id in self.user_ids:
+            self._fed.append(user_id)
+            await self._queue.put((user_id, 0))
+    
+    async def _worker(self):
+        while True:
+            user_id, attempt = await self._queue.get()
+            try:
+                outcome = await self._deliver(user_id, attempt)
+            except Exception as e:
+                logger.error(f"Broadcast to {user_id} crashed: {e}")
+                self.failed += 1
+                outcome = "failed"
+            # A cancelled send never gets here, so the checkpoint stays before it
+            if outcome != "requeued":
+                self._complete(user_id, outcome == "sent")
+                self._queue.task_done()
+    
+    async def _deliver(self, user_id: int, attempt: int):
+        """Send to one user; returns "sent", "failed" or "requeued" (retried later)"""
+        await self._unpaused.wait()
+        await self.limiter.acquire()
+        try:
+            await self.send(user_id)
+        except FloodWait as e:
+            # Slow everyone down, but only this user waits out the flood
+            self.limiter.on_throttled()
+            if attempt < self.max_retries:
+                self.retried += 1
+                task = asyncio.create_task(self._requeue(user_id, attempt + 1, e.value))
+                self._retry_tasks.add(task)
+                task.add_done_callback(self._retry_tasks.discard)
+                return "requeued"
+            self.failed += 1
+        except (UserIsBlocked, InputUserDeactivated) as e:
+            self.failed += 1
+            self.dead += 1
+            if self.on_dead:
+                self.on_dead(user_id, "blocked" if isinstance(e, UserIsBlocked) else "deactivated")
+        except Exception:
+            self.failed += 1
+        else:
+            self.sent += 1
+            self.limiter.on_success()
+            return "sent"
+        return "failed"
+    
+    async def _requeue(self, user_id: int, attempt: int, delay: float):
+        await asyncio.sleep(delay)
+        await self._queue.put((user_id, attempt))
+        # The original item stays unfinished until the retry is back in the queue
+        self._queue.task_done()
+    
+    def _complete(self, user_id: int, sent: bool):
+        """Advance the checkpoint past every user that is fully done"""
+        self._done[user_id] = sent
+        while self._fed and self._fed[0] in self._done:
+            self.checkpoint = self._fed.popleft()
+            if self._done.pop(self.checkpoint):
+                self.checkpoint_sent += 1
+            else:
+                self.checkpoint_failed += 1
+        
+        if self.processed - self._checkpointed_at >= self.checkpoint_every:
+            self._checkpointed_at = self.processed
+            self._checkpoint_due.set()
+    
+    async def _checkpoint_loop(self):
+        """Save checkpoints one at a time so sends never wait on the write"""
+        while True:
+            await self._checkpoint_due.wait()
+            self._checkpoint_due.clear()
+            try:
+                await self.on_checkpoint(self)
+            except Exception as e:
+                logger.warning(f"Broadcast checkpoint failed: {e}")
+
+
+# Shared by all broadcasts so together they stay under Telegram's bulk limit
+amanbotz_broadcast_limiter = AmanbotzTokenBucket(AMANBOTZ_BROADCAST_RATE)
+
+
+def create_broadcast(send, user_ids, on_dead=None, on_checkpoint=None):
+    """Create a broadcast using the configured workers and the shared limiter"""
+    return AmanbotzBroadcast(
+        send,
+        user_ids,
+        amanbotz_broadcast_limiter,
+        workers=AMANBOTZ_BROADCAST_WORKERS,
+        max_retries=AMANBOTZ_BROADCAST_RETRIES,
+        on_dead=on_dead,
+        on_checkpoint=on_checkpoint,
+        checkpoint_every=AMANBOTZ_BROADCAST_CHECKPOINT
+    )
+
+
+class AmanbotzBroadcastManager:
+    def __init__(self, db, worker_id: str, lease_seconds: int = 60, max_jobs: int = 2):
+        self.db = db
+        # Unsharded jobs are leased to one process, so replicas never send the same job twice
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._lease_task = None
+        # Only this many jobs send at once, the rest wait as "queued" (paused jobs hold no slot)
+        self._slots = asyncio.Semaphore(max_jobs)
+        # Job ID (as text) -> {"job", "broadcast", "reporter", "task", "sending", "cancelled", "lost"}
+        self.jobs = {}
+        # Job ID (as text) -> shard setup and status message task of a sharded job, which workers send
+        self._watchers = {}
+    
+    def submit(self, client, job: dict):
+        """Queue a saved broadcast job to run in the background"""
+        if job.get("sharded"):
+            return self.watch_sharded(client, job)
+        
+        job_id = str(job["_id"])
+        entry = {
+            "job": job, "broadcast": None, "reporter": None, "task": None,
+            "sending": False, "cancelled": False, "lost": False
+        }
+        
+        async def save_checkpoint(broadcast):
+            await self._save(entry)
+        
+        entry["broadcast"] = create_broadcast(
+            lambda target_user_id: client.copy_message(
+                chat_id=target_user_id,
+                from_chat_id=job["from_chat_id"],
+                message_id=job["message_id"]
+            ),
+            self.db.iter_user_ids(start_after=job.get("cursor")),
+            on_dead=self.db.queue_dead_user,
+            on_checkpoint=save_checkpoint
+        )
+        entry["broadcast"].restore(job.get("cursor"), job.get("sent", 0), job.get("failed", 0))
+        if job.get("status") == "paused":
+            entry["broadcast"].pause()
+        
+        if job.get("status_message_id"):
+            entry["reporter"] = AmanbotzProgressReporter(
+                lambda text: client.edit_message_text(
+                    job["status_chat_id"],
+                    job["status_message_id"],
+                    text,
+                    parse_mode="HTML"
+                )
+            )
+        
+        entry["task"] = asyncio.create_task(self._run(entry))
+        self.jobs[job_id] = entry
+        entry["task"].add_done_callback(lambda _: self.jobs.pop(job_id, None))
+        return job_id
+    
+    async def resume_unfinished(self, client):
+        """
+        Restart unfinished broadcast jobs that no other process holds,
+        then keep renewing this process's leases and adopting abandoned jobs
+        """
+        jobs = await self.db.get_unfinished_broadcast_jobs()
+        for job in jobs:
+            if job.get("sharded") and job.get("shards_ready"):
+                self.watch_sharded(client, job)
+        resumed = await self._adopt(client, jobs)
+        if self._lease_task is None:
+            self._lease_task = asyncio.create_task(self._lease_loop(client))
+        return resumed
+    
+    async def _adopt(self, client, jobs: list):
+        """Claim and start unsharded jobs, or sharded jobs still being split, that no live process holds"""
+        adopted = 0
+        for job in jobs:
+            job_id = str(job["_id"])
+            if job_id in self.jobs or job_id in self._watchers:
+                continue
+            if job.get("sharded") and job.get("shards_ready"):
+                continue
+            if await self.db.claim_broadcast_job(job["_id"], self.worker_id, self.lease_seconds):
+                logger.info(f"Resuming broadcast job {job['_id']}")
+                self.submit(client, job)
+                adopted += 1
+        return adopted
+    
+    async def _lease_loop(self, client):
+        """Renew leases well before they expire, and pick up jobs whose process stopped"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                for job_id, entry in list(self.jobs.items()):
+                    if entry["job"]["status"] not in ("queued", "running", "paused"):
+                        continue
+                    if not await self.db.claim_broadcast_job(entry["job"]["_id"], self.worker_id, self.lease_seconds):
+                        # Our lease expired and another process resumed the job
+                        logger.warning(f"Lost broadcast job {job_id} to another process")
+                        entry["lost"] = True
+                        entry["task"].cancel()
+                await self._adopt(client, await self.db.get_unfinished_broadcast_jobs())
+            except Exception as e:
+                logger.warning(f"Broadcast job lease renewal failed: {e}")
+    
+    async def _save(self, entry: dict, status: str = None, release: bool = False):
+        """
+        Save a job's checkpoint with the counters up to it (and status, if it changed)
+        release=True gives the job up so any process can resume it right away
+        """
+        broadcast = entry["broadcast"]
+        fields = {"cursor": broadcast.checkpoint, "sent": broadcast.checkpoint_sent, "failed": broadcast.checkpoint_failed}
+        if status:
+            entry["job"]["status"] = fields["status"] = status
+        if release:
+            fields.update(owner=None, lease_until=None)
+        await self.db.update_broadcast_job(entry["job"]["_id"], holder=self.worker_id, **fields)
+    
+    def _status(self, entry: dict):
+        if entry["job"]["status"] in ("done", "cancelled", "failed"):
+            return entry["job"]["status"]
+        if entry["broadcast"].paused:
+            return "paused"
+        return "running" if entry["sending"] else "queued"
+    
+    async def _run(self, entry: dict):
+        job = entry["job"]
+        broadcast = entry["broadcast"]
+        task = None
+        try:
+            try:
+                while task is None or not task.done():
+                    # Paused jobs wait here, leaving their slot to queued jobs
+                    await broadcast.wait_unpaused()
+                    async with self._slots:
+                        if broadcast.paused:
+                            continue
+                        entry["sending"] = True
+                        await self._save(entry, self._status(entry))
+                        if task is None:
+                            task = asyncio.create_task(broadcast.run())
+                        
+                        # The reporter turns these ticks into an edit every few seconds at most
+                        try:
+                            while not task.done() and not broadcast.paused:
+                                await asyncio.wait({task}, timeout=1)
+                                if not task.done():
+                                    await self._report(entry, AMANBOTZ_BROADCAST_PROGRESS)
+                        finally:
+                            entry["sending"] = False
+                    
+                    # Show the paused state before giving up the slot until resumed
+                    if not task.done():
+                        await self._report(entry, AMANBOTZ_BROADCAST_PROGRESS)
+                task.result()
+            finally:
+                if task is not None and not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+        except asyncio.CancelledError:
+            if entry["lost"]:
+                # Another process has the job now, leave its record alone
+                raise
+            # Cancelled by the owner, or stopped by shutdown and resumed by the next process to start
+            await self._save(entry, "cancelled" if entry["cancelled"] else None, release=True)
+            if entry["cancelled"]:
+                await self._report(entry, AMANBOTZ_BROADCAST_CANCELLED, final=True)
+            raise
+        except Exception as e:
+            # Mark it finished so it is not silently resumed on the next restart
+            logger.error(f"Broadcast job {job['_id']} failed: {e}")
+            try:
+                await self._save(entry, "failed", release=True)
+            except Exception as save_error:
+                logger.error(f"Could not save failed broadcast job {job['_id']}: {save_error}")
+            await self._report(entry, AMANBOTZ_BROADCAST_FAILED, final=True)
+            return
+        
+        await self._save(entry, "done")
+        await self._report(entry, AMANBOTZ_BROADCAST_COMPLETE, final=True)
+    
+    async def _report(self, entry: dict, template: str, final: bool = False):
+        """Show the job's state in its status message"""
+        reporter = entry["reporter"]
+        if reporter is None:
+            return
+        text = template.format(**self.describe(entry))
+        if final:
+            await reporter.finish(text)
+        else:
+            reporter.update(text)
+    
+    def describe(self, entry: dict):
+        """Get a job's ID, status, counters, rate and ETA for display"""
+        job = entry["job"]
+        broadcast = entry["broadcast"]
+        rate = broadcast.rate()
+        remaining = max(job["total"] - broadcast.processed, 0)
+        if remaining and rate > 0 and not broadcast.paused:
+            eta = time.strftime("%H:%M:%S", time.gmtime(remaining / rate))
+        else:
+            eta = "-"
+        return {
+            "job_id": str(job["_id"]),
+            "status": self._status(entry),
+            "sent": broadcast.sent,
+            "failed": broadcast.failed,
+            "total": job["total"],
+            "rate": f"{rate:.1f}",
+            "eta": eta
+        }
+    
+    def describe_job(self, job: dict):
+        """Describe a sharded job from the counters its workers saved"""
+        processed = job["sent"] + job["failed"]
+        elapsed = (datetime.now() - job["created_date"]).total_seconds()
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(job["total"] - processed, 0)
+        if remaining and rate > 0 and job["status"] in ("queued", "running"):
+            eta = time.strftime("%H:%M:%S", time.gmtime(remaining / rate))
+        else:
+            eta = "-"
+        return {
+            "job_id": str(job["_id"]),
+            "status": f"{job['status']}, sharded",
+            "sent": job["sent"],
+            "failed": job["failed"],
+            "total": job["total"],
+            "rate": f"{rate:.1f}",
+            "eta": eta
+        }
+    
+    async def _sharded_jobs(self):
+        jobs = await self.db.get_unfinished_broadcast_jobs()
+        return [job for job in jobs if job.get("sharded")]
+    
+    async def list_jobs(self):
+        """Describe every job in this process and every sharded job, oldest first"""
+        local = [self.describe(entry) for entry in self.jobs.values()]
+        sharded = [self.describe_job(job) for job in await self._sharded_jobs()] if SHARDING_ENABLED else []
+        return local + sharded
+    
+    async def find(self, job_ref: str = None):
+        """
+        Find a job by exact ID, else by unique ID prefix (or the only job, if none is given)
+        Returns a local job entry, a sharded job document, or None
+        """
+        candidates = list(self.jobs.items())
+        if SHARDING_ENABLED:
+            candidates += [(str(job["_id"]), job) for job in await self._sharded_jobs()]
+        if job_ref:
+            exact = [(job_id, found) for job_id, found in candidates if job_id == job_ref]
+            candidates = exact or [(job_id, found) for job_id, found in candidates if job_id.startswith(job_ref)]
+        return candidates[0][1] if len(candidates) == 1 else None
+    
+    async def _set_sharded_status(self, job: dict, status: str):
+        # Workers notice the new status on their next lease renewal
+        await self.db.update_broadcast_job(job["_id"], status=status)
+        job["status"] = status
+        if status == "running":
+            await self.db.finish_broadcast_job(job["_id"])
+        return self.describe_job(job)
+    
+    async def pause(self, job_ref: str = None):
+        """Pause a job; returns its description, or None if not found"""
+        entry = await self.find(job_ref)
+        if entry is None:
+            return None
+        if "broadcast" not in entry:
+            return await self._set_sharded_status(entry, "paused")
+        entry["broadcast"].pause()
+        await self._save(entry, "paused")
+        return self.describe(entry)
+    
+    async def resume(self, job_ref: str = None):
+        """Resume a paused job; returns its description, or None if not found"""
+        entry = await self.find(job_ref)
+        if entry is None:
+            return None
+        if "broadcast" not in entry:
+            return await self._set_sharded_status(entry, "running")
+        entry["broadcast"].resume()
+        await self._save(entry, self._status(entry))
+        return self.describe(entry)
+    
+    async def cancel(self, job_ref: str = None):
+        """Cancel a job for good; returns its description, or None if not found"""
+        entry = await self.find(job_ref)
+        if entry is None:
+            return None
+        if "broadcast" not in entry:
+            return dict(await self._set_sharded_status(entry, "cancelled"), eta="-")
+        description = self.describe(entry)
+        entry["cancelled"] = True
+        entry["task"].cancel()
+        await asyncio.gather(entry["task"], return_exceptions=True)
+        return dict(description, status="cancelled", eta="-")
+    
+    def watch_sharded(self, client, job: dict):
+        """Split a sharded job if that is not done yet, then keep its status message up to date"""
+        job_id = str(job["_id"])
+        task = asyncio.create_task(self._watch_sharded(client, job))
+        self._watchers[job_id] = task
+        task.add_done_callback(lambda _: self._watchers.pop(job_id, None))
+        return job_id
+    
+    async def _watch_sharded(self, client, job: dict):
+        reporter = None
+        if job.get("status_message_id"):
+            reporter = AmanbotzProgressReporter(
+                lambda text: client.edit_message_text(
+                    job["status_chat_id"],
+                    job["status_message_id"],
+                    text,
+                    parse_mode="HTML"
+                )
+            )
+        
+        # Splitting scans the users collection, so it runs here instead of in the command handler
+        if not job.get("shards_ready"):
+            split = asyncio.create_task(self.db.create_broadcast_shards(job["_id"], AMANBOTZ_BROADCAST_SHARD_SIZE))
+            try:
+                # Hold the job while splitting so no other process splits it too
+                while not split.done():
+                    await asyncio.wait({split}, timeout=self.lease_seconds / 3)
+                    if not split.done():
+                        await self.db.claim_broadcast_job(job["_id"], self.worker_id, self.lease_seconds)
+                logger.info(f"Broadcast job {job['_id']} split into {split.result()} shards")
+            except Exception as e:
+                logger.error(f"Could not split broadcast job {job['_id']}: {e}")
+                await self.db.update_broadcast_job(job["_id"], status="failed", owner=None, lease_until=None)
+                job["status"] = "failed"
+                if reporter:
+                    await reporter.finish(AMANBOTZ_BROADCAST_FAILED.format(**self.describe_job(job)))
+                return
+            finally:
+                if not split.done():
+                    split.cancel()
+                    await asyncio.gather(split, return_exceptions=True)
+        if reporter is None:
+            return
+        
+        templates = {"done": AMANBOTZ_BROADCAST_COMPLETE, "cancelled": AMANBOTZ_BROADCAST_CANCELLED}
+        while True:
+            await asyncio.sleep(reporter.min_interval)
+            try:
+                job = await self.db.get_broadcast_job(job["_id"]) or job
+            except Exception as e:
+                logger.warning(f"Could not read broadcast job {job['_id']}: {e}")
+                continue
+            text_template = templates.get(job["status"])
+            if text_template:
+                await reporter.finish(text_template.format(**self.describe_job(job)))
+                return
+            reporter.update(AMANBOTZ_BROADCAST_PROGRESS.format(**self.describe_job(job)))
+    
+    async def stop(self):
+        """Stop all jobs on shutdown, saving their checkpoints"""
+        tasks = [entry["task"] for entry in self.jobs.values()] + list(self._watchers.values())
+        if self._lease_task:
+            tasks.append(self._lease_task)
+            self._lease_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class AmanbotzShardWorker:
+    def __init__(self, db, worker_id: str, lease_seconds: int = 60, poll_interval: float = 5.0,
+                 limiter: AmanbotzTokenBucket = None, rate: float = None):
+        self.db = db
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Telegram's limit is per bot, so the workers sending at once split one rate between them
+        self.limiter = limiter
+        self.rate = rate
+        self.workers = 1
+        self._task = None
+        
+        # Counters
+        self.shards_done = 0
+        self.shards_released = 0
+        self.leases_lost = 0
+    
+    def start(self, client):
+        """Start leasing and sending shards in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(client))
+            logger.info(f"Broadcast shard worker {self.worker_id} started")
+    
+    async def stop(self):
+        """Stop the worker, handing back its current shard"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _loop(self, client):
+        while True:
+            try:
+                shard = None
+                job_ids = await self.db.get_active_sharded_job_ids()
+                if job_ids:
+                    shard = await self.db.lease_broadcast_shard(job_ids, self.worker_id, self.lease_seconds)
+                if shard is not None:
+                    await self._run_shard(client, shard)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast shard worker error: {e}")
+            await asyncio.sleep(self.poll_interval)
+    
+    async def _share_rate(self):
+        """Take an equal share of the bot's rate among the workers holding shard leases"""
+        if self.limiter is None:
+            return
+        try:
+            self.workers = max(await self.db.count_broadcast_workers(), 1)
+        except Exception as e:
+            logger.warning(f"Could not count broadcast workers: {e}")
+            return
+        share = self.rate / self.workers
+        if share != self.limiter.base_rate:
+            logger.info(f"Broadcast rate share: {share:.1f} msg/s ({self.workers} workers)")
+            self.limiter.set_base_rate(share)
+    
+    async def _run_shard(self, client, shard: dict):
+        """Send one leased shard, renewing the lease until it is done or stopped"""
+        job = await self.db.get_broadcast_job(shard["job_id"])
+        if job is None:
+            await self.db.update_broadcast_shard(shard["_id"], self.worker_id, status="done")
+            return
+        if job["status"] == "queued":
+            await self.db.update_broadcast_job(job["_id"], status="running")
+        
+        # Job counters get only what this worker added since its last save
+        saved = {"sent": shard["sent"], "failed": shard["failed"]}
+        
+        async def save(broadcast, status: str = None):
+            # Counters up to the checkpoint, so users re-sent after a lost lease count once
+            sent, failed = broadcast.checkpoint_sent, broadcast.checkpoint_failed
+            held = await self.db.update_broadcast_shard(
+                shard["_id"],
+                self.worker_id,
+                lease_seconds=None if status else self.lease_seconds,
+                status=status,
+                cursor=broadcast.checkpoint,
+                sent=sent,
+                failed=failed
+            )
+            if held:
+                delta_sent, delta_failed = sent - saved["sent"], failed - saved["failed"]
+                saved.update(sent=sent, failed=failed)
+                await self.db.add_broadcast_job_counts(job["_id"], sent=delta_sent, failed=delta_failed)
+            return held
+        
+        cursor = shard["cursor"] if shard["cursor"] is not None else shard["start_after"]
+        broadcast = create_broadcast(
+            lambda target_user_id: client.copy_message(
+                chat_id=target_user_id,
+                from_chat_id=job["from_chat_id"],
+                message_id=job["message_id"]
+            ),
+            self.db.iter_user_ids(start_after=cursor, end=shard["end"]),
+            on_dead=self.db.queue_dead_user,
+            on_checkpoint=save
+        )
+        broadcast.restore(cursor, shard["sent"], shard["failed"])
+        await self._share_rate()
+        
+        task = asyncio.create_task(broadcast.run())
+        held = True
+        try:
+            # Renew the lease well before it expires, and stop if the job was paused or cancelled
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.lease_seconds / 3)
+                if task.done():
+                    break
+                job = await self.db.get_broadcast_job(job["_id"]) or job
+                held = await save(broadcast)
+                if not held or job["status"] not in ("queued", "running"):
+                    break
+                # Workers joining or leaving change everyone's share
+                await self._share_rate()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            if not held:
+                self.leases_lost += 1
+                logger.warning(f"Lost the lease on broadcast shard {shard['_id']}")
+            elif task.cancelled() or task.exception():
+                # Hand the rest of the shard back for any worker to pick up
+                self.shards_released += 1
+                await asyncio.shield(save(broadcast, status="pending"))
+        
+        if held and not task.cancelled() and not task.exception():
+            await save(broadcast, status="done")
+            self.shards_done += 1
+            await self.db.finish_broadcast_job(job["_id"])
+    
+    def stats(self):
+        """Get worker counters"""
+        return {
+            "worker_id": self.worker_id,
+            "shards_done": self.shards_done,
+            "shards_released": self.shards_released,
+            "leases_lost": self.leases_lost,
+            "workers": self.workers,
+            "rate": self.limiter.base_rate if self.limiter else None
+        }
+
+
+# Sharding needs leases that every worker can see, which only some backends provide
+SHARDING_ENABLED = AMANBOTZ_BROADCAST_SHARD_SIZE > 0 and isinstance(amanbotz_db, AmanbotzShardingMixin)
+
+# Create broadcast manager instance
+amanbotz_broadcasts = AmanbotzBroadcastManager(
+    amanbotz_db,
+    AMANBOTZ_WORKER_ID,
+    AMANBOTZ_BROADCAST_LEASE,
+    AMANBOTZ_BROADCAST_MAX_JOBS
+)
+
+# Create shard worker instance
+amanbotz_shard_worker = AmanbotzShardWorker(
+    amanbotz_db,
+    AMANBOTZ_WORKER_ID,
+    AMANBOTZ_BROADCAST_LEASE,
+    limiter=amanbotz_broadcast_limiter,
+    rate=AMANBOTZ_BROADCAST_RATE
+)
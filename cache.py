@@ -0,0 +1,107 @@
+"""
+In-Memory Cache for Poster Bot
+LRU cache with per-entry TTL and size-based eviction
+"""
+
+import json
+import time
+from collections import OrderedDict
+
+
+class AmanbotzTTLCache:
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 0, default_ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        
+        # key -> (expires_at, size, value), oldest first
+        self._data = OrderedDict()
+        self.total_bytes = 0
+        
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+    
+    @staticmethod
+    def _size_of(value):
+        """Approximate the memory cost of a value by its JSON length"""
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return 0
+    
+    def get(self, key, default=None):
+        """Get a value, refreshing its LRU position"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        if entry[0] <= time.monotonic():
+            # Expired
+            self._remove(key)
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+    
+    def set(self, key, value, ttl: float = None):
+        """Store a value and evict old entries if over budget"""
+        if key in self._data:
+            self._remove(key)
+        
+        size = self._size_of(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # Never cache a single value bigger than the whole budget
+            return
+        
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        self._data[key] = (expires_at, size, value)
+        self.total_bytes += size
+        self._evict()
+    
+    def delete(self, key):
+        """Remove a value if present"""
+        if key in self._data:
+            self._remove(key)
+    
+    def clear(self):
+        """Remove all values"""
+        self._data.clear()
+        self.total_bytes = 0
+    
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.total_bytes -= size
+    
+    def _evict(self):
+        """Drop least recently used entries until within budget"""
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+    
+    def stats(self):
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
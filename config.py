@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,6 +14,10 @@ AMANBOTZ_API_HASH = os.environ.get("AMANBOTZ_API_HASH", "")
 AMANBOTZ_MONGODB_URI = os.environ.get("AMANBOTZ_MONGODB_URI", "")
 AMANBOTZ_DB_NAME = os.environ.get("AMANBOTZ_DB_NAME", "amanbotz_poster_bot")
 
+# Storage Backend: "mongodb" (default) or "sqlite" for a single-instance embedded database
+AMANBOTZ_DB_BACKEND = os.environ.get("AMANBOTZ_DB_BACKEND", "mongodb").lower()
+AMANBOTZ_SQLITE_PATH = os.environ.get("AMANBOTZ_SQLITE_PATH", "amanbotz_poster_bot.db")
+
 # API Keys (Optional - at least one required)
 AMANBOTZ_TMDB_API = os.environ.get("AMANBOTZ_TMDB_API", "")
 AMANBOTZ_OMDB_API = os.environ.get("AMANBOTZ_OMDB_API", "")
@@ -31,6 +36,17 @@ def check_api_config():
         raise ValueError("At least one API key (TMDB or OMDB) must be provided!")
     return True
 
+# Check that the storage backend supports the configured features
+def check_db_config():
+    """Check the database backend and the options that depend on it"""
+    if AMANBOTZ_DB_BACKEND not in ("mongodb", "sqlite"):
+        raise ValueError(f"Unknown AMANBOTZ_DB_BACKEND {AMANBOTZ_DB_BACKEND!r}, use mongodb or sqlite!")
+    if AMANBOTZ_DB_BACKEND == "sqlite" and AMANBOTZ_BROADCAST_SHARD_SIZE > 0:
+        raise ValueError("AMANBOTZ_BROADCAST_SHARD_SIZE needs the MongoDB backend, set it to 0 for sqlite!")
+    if AMANBOTZ_DB_BACKEND == "sqlite" and AMANBOTZ_WORKER_ONLY:
+        raise ValueError("AMANBOTZ_WORKER_ONLY needs the MongoDB backend (sharded broadcasts)!")
+    return True
+
 # Determine which API to use
 def get_available_api():
     """Return which API is available"""
@@ -47,3 +63,82 @@ AMANBOTZ_BOT_USERNAME = os.environ.get("AMANBOTZ_BOT_USERNAME", "")
 
 # Scheduler Interval (in hours)
 AMANBOTZ_CHECK_INTERVAL = int(os.environ.get("AMANBOTZ_CHECK_INTERVAL", "6"))
+
+# HTTP Client Configuration (shared connection pool per movie API provider)
+AMANBOTZ_HTTP_POOL_LIMIT = int(os.environ.get("AMANBOTZ_HTTP_POOL_LIMIT", "100"))
+AMANBOTZ_HTTP_PER_HOST_LIMIT = int(os.environ.get("AMANBOTZ_HTTP_PER_HOST_LIMIT", "20"))
+AMANBOTZ_HTTP_TIMEOUT = float(os.environ.get("AMANBOTZ_HTTP_TIMEOUT", "10"))
+AMANBOTZ_HTTP_CONNECT_TIMEOUT = float(os.environ.get("AMANBOTZ_HTTP_CONNECT_TIMEOUT", "5"))
+AMANBOTZ_HTTP_KEEPALIVE = float(os.environ.get("AMANBOTZ_HTTP_KEEPALIVE", "30"))
+AMANBOTZ_HTTP_DNS_TTL = int(os.environ.get("AMANBOTZ_HTTP_DNS_TTL", "300"))
+
+# API Response Cache (in-memory LRU, optionally persisted to MongoDB)
+AMANBOTZ_API_CACHE_SIZE = int(os.environ.get("AMANBOTZ_API_CACHE_SIZE", "2000"))
+AMANBOTZ_API_CACHE_MAX_MB = int(os.environ.get("AMANBOTZ_API_CACHE_MAX_MB", "32"))
+AMANBOTZ_API_CACHE_DETAILS_TTL = int(os.environ.get("AMANBOTZ_API_CACHE_DETAILS_TTL", "86400"))
+AMANBOTZ_API_CACHE_SEARCH_TTL = int(os.environ.get("AMANBOTZ_API_CACHE_SEARCH_TTL", "3600"))
+AMANBOTZ_API_CACHE_PERSIST = os.environ.get("AMANBOTZ_API_CACHE_PERSIST", "True").lower() in ("true", "1", "yes")
+
+# Search Mode: "sequential" (OMDB, then TMDB) or "hedged" (both at once)
+AMANBOTZ_SEARCH_MODE = os.environ.get("AMANBOTZ_SEARCH_MODE", "sequential").lower()
+AMANBOTZ_SEARCH_HEDGE_MS = int(os.environ.get("AMANBOTZ_SEARCH_HEDGE_MS", "400"))
+
+# New Release Discovery (TMDB pages per list, parallel page requests)
+AMANBOTZ_RELEASE_PAGES = int(os.environ.get("AMANBOTZ_RELEASE_PAGES", "1"))
+AMANBOTZ_RELEASE_CONCURRENCY = int(os.environ.get("AMANBOTZ_RELEASE_CONCURRENCY", "4"))
+
+# API Rate Limits (requests per second per provider)
+AMANBOTZ_OMDB_RATE = float(os.environ.get("AMANBOTZ_OMDB_RATE", "5"))
+AMANBOTZ_TMDB_RATE = float(os.environ.get("AMANBOTZ_TMDB_RATE", "40"))
+AMANBOTZ_API_MAX_RETRIES = int(os.environ.get("AMANBOTZ_API_MAX_RETRIES", "2"))
+AMANBOTZ_API_MAX_RETRY_WAIT = float(os.environ.get("AMANBOTZ_API_MAX_RETRY_WAIT", "30"))
+
+# API Circuit Breaker (skip a provider while it is failing or slow)
+AMANBOTZ_BREAKER_FAILURES = int(os.environ.get("AMANBOTZ_BREAKER_FAILURES", "5"))
+AMANBOTZ_BREAKER_SLOW_MS = int(os.environ.get("AMANBOTZ_BREAKER_SLOW_MS", "3000"))
+AMANBOTZ_BREAKER_COOLDOWN = int(os.environ.get("AMANBOTZ_BREAKER_COOLDOWN", "30"))
+
+# Search Prefetch (warm the details cache for the top results, 0 to disable)
+AMANBOTZ_PREFETCH_TOP_K = int(os.environ.get("AMANBOTZ_PREFETCH_TOP_K", "3"))
+AMANBOTZ_PREFETCH_CONCURRENCY = int(os.environ.get("AMANBOTZ_PREFETCH_CONCURRENCY", "2"))
+
+# Featured Poster Pool for /start (pool size, refresh interval in minutes)
+AMANBOTZ_POSTER_POOL_SIZE = int(os.environ.get("AMANBOTZ_POSTER_POOL_SIZE", "20"))
+AMANBOTZ_POSTER_POOL_REFRESH = int(os.environ.get("AMANBOTZ_POSTER_POOL_REFRESH", "30"))
+
+# Ban/Admin List Sync (polling interval in seconds when change streams are unavailable)
+AMANBOTZ_MEMBERSHIP_POLL = int(os.environ.get("AMANBOTZ_MEMBERSHIP_POLL", "30"))
+
+# User Write-Behind (flush buffered user updates every N users or M milliseconds)
+AMANBOTZ_USER_FLUSH_SIZE = int(os.environ.get("AMANBOTZ_USER_FLUSH_SIZE", "500"))
+AMANBOTZ_USER_FLUSH_MS = int(os.environ.get("AMANBOTZ_USER_FLUSH_MS", "1000"))
+
+# Dead User Pruning (keep removed users in deleted_users with a reason, for auditing)
+AMANBOTZ_USER_SOFT_DELETE = os.environ.get("AMANBOTZ_USER_SOFT_DELETE", "False").lower() in ("true", "1", "yes")
+
+# Broadcast Engine (messages per second across all broadcasts, concurrent senders, FloodWait retries per user)
+AMANBOTZ_BROADCAST_RATE = float(os.environ.get("AMANBOTZ_BROADCAST_RATE", "25"))
+AMANBOTZ_BROADCAST_WORKERS = int(os.environ.get("AMANBOTZ_BROADCAST_WORKERS", "10"))
+AMANBOTZ_BROADCAST_RETRIES = int(os.environ.get("AMANBOTZ_BROADCAST_RETRIES", "3"))
+AMANBOTZ_BROADCAST_CHECKPOINT = int(os.environ.get("AMANBOTZ_BROADCAST_CHECKPOINT", "500"))
+AMANBOTZ_BROADCAST_MAX_JOBS = int(os.environ.get("AMANBOTZ_BROADCAST_MAX_JOBS", "2"))
+
+# Sharded Broadcasts (MongoDB only): split jobs into shards of N users that any running worker can lease (0 to disable)
+AMANBOTZ_BROADCAST_SHARD_SIZE = int(os.environ.get("AMANBOTZ_BROADCAST_SHARD_SIZE", "0"))
+AMANBOTZ_BROADCAST_LEASE = int(os.environ.get("AMANBOTZ_BROADCAST_LEASE", "60"))
+AMANBOTZ_WORKER_ID = os.environ.get("AMANBOTZ_WORKER_ID", "") or f"{socket.gethostname()}-{os.getpid()}"
+# Run as a broadcast worker only: no command handlers, scheduler or auto-posting
+AMANBOTZ_WORKER_ONLY = os.environ.get("AMANBOTZ_WORKER_ONLY", "False").lower() in ("true", "1", "yes")
+
+# Progress Messages (minimum seconds between edits of a broadcast/auto-post status message)
+AMANBOTZ_PROGRESS_INTERVAL = float(os.environ.get("AMANBOTZ_PROGRESS_INTERVAL", "5"))
+
+# Stats Source: maintained counters (default) or MongoDB's estimated counts
+AMANBOTZ_STATS_ESTIMATED = os.environ.get("AMANBOTZ_STATS_ESTIMATED", "False").lower() in ("true", "1", "yes")
+
+# Stats Recount (rebuild the maintained counters from the data every N hours, 0 to disable)
+AMANBOTZ_STATS_RECOUNT_HOURS = int(os.environ.get("AMANBOTZ_STATS_RECOUNT_HOURS", "24"))
+
+# MongoDB Command Metrics (per-command latency in /stats, commands slower than N ms are logged)
+AMANBOTZ_DB_METRICS = os.environ.get("AMANBOTZ_DB_METRICS", "True").lower() in ("true", "1", "yes")
+AMANBOTZ_DB_SLOW_MS = int(os.environ.get("AMANBOTZ_DB_SLOW_MS", "100"))
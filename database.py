@@ -3,14 +3,38 @@ MongoDB Database Handler for Poster Bot
 Handles all database operations with async support
 """
 
+import asyncio
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import AMANBOTZ_MONGODB_URI, AMANBOTZ_DB_NAME, AMANBOTZ_OWNER_ID
-from datetime import datetime
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from config import (
+    AMANBOTZ_MONGODB_URI,
+    AMANBOTZ_DB_NAME,
+    AMANBOTZ_DB_BACKEND,
+    AMANBOTZ_SQLITE_PATH,
+    AMANBOTZ_OWNER_ID,
+    AMANBOTZ_MEMBERSHIP_POLL,
+    AMANBOTZ_USER_FLUSH_SIZE,
+    AMANBOTZ_USER_FLUSH_MS,
+    AMANBOTZ_USER_SOFT_DELETE,
+    AMANBOTZ_STATS_ESTIMATED,
+    AMANBOTZ_DB_METRICS,
+    AMANBOTZ_DB_SLOW_MS
+)
+from db_metrics import AmanbotzCommandMetrics
+from database_base import AmanbotzDatabaseBase, AmanbotzShardingMixin
+from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
 
-class AmanbotzDatabase:
+
+class AmanbotzDatabase(AmanbotzDatabaseBase, AmanbotzShardingMixin):
     def __init__(self):
-        self.client = AsyncIOMotorClient(AMANBOTZ_MONGODB_URI)
+        # Command latency and pool wait metrics, shown in /stats
+        self.metrics = AmanbotzCommandMetrics(AMANBOTZ_DB_SLOW_MS) if AMANBOTZ_DB_METRICS else None
+        listeners = [self.metrics, self.metrics.pool] if self.metrics else []
+        self.client = AsyncIOMotorClient(AMANBOTZ_MONGODB_URI, event_listeners=listeners)
         self.db = self.client[AMANBOTZ_DB_NAME]
         
         # Collections
@@ -19,25 +43,276 @@ class AmanbotzDatabase:
         self.banned_users = self.db["banned_users"]
         self.settings = self.db["settings"]
         self.posted_movies = self.db["posted_movies"]
+        self.api_cache = self.db["api_cache"]
+        self.poster_files = self.db["poster_files"]
+        self.migrations = self.db["schema_migrations"]
+        self.deleted_users = self.db["deleted_users"]
+        self.broadcast_jobs = self.db["broadcast_jobs"]
+        self.broadcast_shards = self.db["broadcast_shards"]
+        
+        # In-memory ban/admin lists and settings, kept in sync by start_sync()
+        self.banned_ids = set()
+        self.admin_ids = set()
+        self.settings_snapshot = None
+        self.synced = False
+        
+        # IDs known to be posted; only misses need a MongoDB lookup
+        self.posted_ids = set()
+        
+        # Write-behind buffer of user upserts, keyed by user_id
+        self._user_buffer = {}
+        # Users who blocked the bot or were deleted: user_id -> reason
+        self._dead_users = {}
+        self._flush_wakeup = asyncio.Event()
+        self._write_behind_stopping = False
+        self._write_behind_task = None
+        self._sync_tasks = []
+    
+    async def close(self):
+        """Close the MongoDB connection"""
+        self.client.close()
+    
+    def get_command_stats(self, top: int = None):
+        """Get MongoDB command latency and pool wait metrics"""
+        return self.metrics.stats(top) if self.metrics else None
+    
+    # ============ Schema Bootstrap ============
+    async def setup_schema(self):
+        """Apply pending schema migrations (safe to run from several replicas)"""
+        migrations = [
+            (1, "remove duplicate rows", self._migrate_dedupe),
+            (2, "create unique indexes", self._migrate_indexes),
+            (3, "initialize stats counters", self.recount_stats),
+            (4, "index deleted users", self._migrate_deleted_users),
+            (5, "index broadcast shards", self._migrate_broadcast_shards)
+        ]
+        applied = {doc["_id"] async for doc in self.migrations.find({}, {"_id": 1})}
+        for version, description, migrate in migrations:
+            if version in applied:
+                continue
+            logger.info(f"Applying schema migration {version}: {description}")
+            await migrate()
+            await self.migrations.update_one(
+                {"_id": version},
+                {"$setOnInsert": {"description": description, "applied_date": datetime.now()}},
+                upsert=True
+            )
+    
+    async def _dedupe(self, collection, key: str):
+        """Keep the oldest row for each key and delete the rest"""
+        pipeline = [
+            {"$sort": {"_id": ASCENDING}},
+            {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ]
+        removed = 0
+        async for group in collection.aggregate(pipeline, allowDiskUse=True):
+            result = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+            removed += result.deleted_count
+        if removed:
+            logger.info(f"Removed {removed} duplicate rows from {collection.name}")
+    
+    async def _migrate_dedupe(self):
+        await self._dedupe(self.users, "user_id")
+        await self._dedupe(self.admins, "user_id")
+        await self._dedupe(self.banned_users, "user_id")
+        await self._dedupe(self.posted_movies, "movie_id")
+    
+    async def _migrate_indexes(self):
+        await self.users.create_index("user_id", unique=True)
+        await self.admins.create_index("user_id", unique=True)
+        await self.banned_users.create_index("user_id", unique=True)
+        await self.posted_movies.create_index("movie_id", unique=True)
+    
+    async def _migrate_deleted_users(self):
+        # $merge into deleted_users needs a unique index on its key
+        await self.deleted_users.create_index("user_id", unique=True)
+    
+    async def _migrate_broadcast_shards(self):
+        await self.broadcast_shards.create_index([("job_id", ASCENDING), ("index", ASCENDING)], unique=True)
+        await self.broadcast_shards.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+    
+    async def _insert_if_missing(self, collection, key: dict, fields: dict, counter: str = None):
+        """Insert a row unless one with this key exists, in one round trip"""
+        try:
+            result = await collection.update_one(
+                key,
+                {"$setOnInsert": dict(key, **fields)},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent upsert
+            return False
+        inserted = result.upserted_id is not None
+        if inserted and counter:
+            await self._bump_counters(**{counter: 1})
+        return inserted
+    
+    async def _delete(self, collection, key: dict, counter: str = None):
+        """Delete a row and keep its counter in step"""
+        result = await collection.delete_one(key)
+        if result.deleted_count and counter:
+            await self._bump_counters(**{counter: -result.deleted_count})
+        return result.deleted_count > 0
     
     # ============ User Operations ============
     async def add_user(self, user_id: int, username: str = None, first_name: str = None):
         """Add a new user to the database"""
-        user = await self.users.find_one({"user_id": user_id})
-        if not user:
-            await self.users.insert_one({
-                "user_id": user_id,
-                "username": username,
-                "first_name": first_name,
-                "joined_date": datetime.now()
-            })
-            return True
-        return False
+        return await self._insert_if_missing(self.users, {"user_id": user_id}, {
+            "username": username,
+            "first_name": first_name,
+            "joined_date": datetime.now()
+        }, counter="users")
+    
+    def queue_user(self, user_id: int, username: str = None, first_name: str = None, register: bool = True):
+        """
+        Buffer a user registration (or, with register=False, a last_seen
+        update for an existing user) to be written in the next batch
+        """
+        now = datetime.now()
+        pending = self._user_buffer.get(user_id)
+        self._user_buffer[user_id] = {
+            "username": username if username is not None else (pending or {}).get("username"),
+            "first_name": first_name if first_name is not None else (pending or {}).get("first_name"),
+            "last_seen": now,
+            "register": register or bool(pending and pending["register"])
+        }
+        if len(self._user_buffer) >= AMANBOTZ_USER_FLUSH_SIZE:
+            self._flush_wakeup.set()
+    
+    async def flush_users(self):
+        """Write all buffered user updates with one bulk_write"""
+        if not self._user_buffer:
+            return
+        
+        buffer, self._user_buffer = self._user_buffer, {}
+        operations = []
+        for user_id, entry in buffer.items():
+            update = {"$set": {"last_seen": entry["last_seen"]}}
+            if entry["register"]:
+                for field in ("username", "first_name"):
+                    if entry[field] is not None:
+                        update["$set"][field] = entry[field]
+                update["$setOnInsert"] = {"joined_date": entry["last_seen"]}
+            operations.append(UpdateOne({"user_id": user_id}, update, upsert=entry["register"]))
+        
+        try:
+            result = await self.users.bulk_write(operations, ordered=False)
+            created = result.upserted_count
+        except BulkWriteError as e:
+            # Duplicate keys mean a concurrent upsert already created the user
+            created = e.details.get("nUpserted", 0)
+            errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != 11000]
+            if errors:
+                logger.error(f"User flush had {len(errors)} failed writes: {errors[0].get('errmsg')}")
+        except Exception as e:
+            logger.error(f"User flush failed, retrying next batch: {e}")
+            # Put entries back without overwriting anything newer
+            for user_id, entry in buffer.items():
+                self._user_buffer.setdefault(user_id, entry)
+            return
+        
+        if created:
+            await self._bump_counters(users=created)
+    
+    def queue_dead_user(self, user_id: int, reason: str):
+        """Buffer a user who can no longer be reached, to be removed in the next batch"""
+        self._user_buffer.pop(user_id, None)
+        self._dead_users[user_id] = reason
+        if len(self._dead_users) >= AMANBOTZ_USER_FLUSH_SIZE:
+            self._flush_wakeup.set()
+    
+    async def flush_dead_users(self):
+        """Remove all buffered dead users with one delete_many"""
+        if not self._dead_users:
+            return
+        
+        buffer, self._dead_users = self._dead_users, {}
+        try:
+            if AMANBOTZ_USER_SOFT_DELETE:
+                await self._archive_users(buffer)
+            result = await self.users.delete_many({"user_id": {"$in": list(buffer)}})
+        except Exception as e:
+            logger.error(f"Dead user flush failed, retrying next batch: {e}")
+            for user_id, reason in buffer.items():
+                self._dead_users.setdefault(user_id, reason)
+            return
+        
+        if result.deleted_count:
+            await self._bump_counters(users=-result.deleted_count)
+            logger.info(f"Removed {result.deleted_count} unreachable users")
+    
+    async def _archive_users(self, dead_users: dict):
+        """Copy user rows into deleted_users with their removal reason"""
+        by_reason = {}
+        for user_id, reason in dead_users.items():
+            by_reason.setdefault(reason, []).append(user_id)
+        
+        deleted_date = datetime.now()
+        for reason, user_ids in by_reason.items():
+            pipeline = [
+                {"$match": {"user_id": {"$in": user_ids}}},
+                {"$project": {"_id": 0}},
+                {"$set": {"deleted_reason": {"$literal": reason}, "deleted_date": deleted_date}},
+                {"$merge": {"into": "deleted_users", "on": "user_id", "whenMatched": "replace"}}
+            ]
+            async for _ in self.users.aggregate(pipeline):
+                pass
+    
+    async def _write_behind_loop(self):
+        while not self._write_behind_stopping:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=AMANBOTZ_USER_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush_users()
+            await self.flush_dead_users()
+    
+    def start_write_behind(self):
+        """Start flushing buffered user updates in the background"""
+        if self._write_behind_task is None:
+            self._write_behind_stopping = False
+            self._write_behind_task = asyncio.create_task(self._write_behind_loop())
+    
+    async def stop_write_behind(self):
+        """Stop the background flusher and write whatever is left"""
+        if self._write_behind_task:
+            # Never cancel a flush midway: its batch is already out of the buffers
+            self._write_behind_stopping = True
+            self._flush_wakeup.set()
+            await asyncio.gather(self._write_behind_task, return_exceptions=True)
+            self._write_behind_task = None
+        await self.flush_users()
+        await self.flush_dead_users()
     
     async def get_all_users(self):
         """Get all user IDs"""
-        users = self.users.find({})
-        return [user["user_id"] async for user in users]
+        return [user_id async for user_id in self.iter_user_ids()]
+    
+    async def iter_user_ids(self, batch_size: int = 1000, start_after: int = None, end: int = None):
+        """
+        Stream user IDs in ascending order, one batch at a time
+        Each batch is a short indexed range query, so memory stays flat and
+        a stopped stream can be resumed with start_after=<last ID seen>
+        Pass end to stop after that ID (inclusive)
+        """
+        last_id = start_after
+        while True:
+            query = {"user_id": {}}
+            if last_id is not None:
+                query["user_id"]["$gt"] = last_id
+            if end is not None:
+                query["user_id"]["$lte"] = end
+            if not query["user_id"]:
+                query = {}
+            cursor = self.users.find(query, {"user_id": 1, "_id": 0}).sort("user_id", ASCENDING).limit(batch_size)
+            batch = [user["user_id"] async for user in cursor]
+            for user_id in batch:
+                yield user_id
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1]
     
     async def get_users_count(self):
         """Get total user count"""
@@ -45,29 +320,29 @@ class AmanbotzDatabase:
     
     async def delete_user(self, user_id: int):
         """Delete a user from database"""
-        await self.users.delete_one({"user_id": user_id})
+        await self._delete(self.users, {"user_id": user_id}, counter="users")
     
     # ============ Admin Operations ============
     async def add_admin(self, user_id: int):
         """Add a new admin"""
-        admin = await self.admins.find_one({"user_id": user_id})
-        if not admin:
-            await self.admins.insert_one({
-                "user_id": user_id,
-                "added_date": datetime.now()
-            })
-            return True
-        return False
+        added = await self._insert_if_missing(self.admins, {"user_id": user_id}, {
+            "added_date": datetime.now()
+        }, counter="admins")
+        self.admin_ids.add(user_id)
+        return added
     
     async def remove_admin(self, user_id: int):
         """Remove an admin"""
-        result = await self.admins.delete_one({"user_id": user_id})
-        return result.deleted_count > 0
+        removed = await self._delete(self.admins, {"user_id": user_id}, counter="admins")
+        self.admin_ids.discard(user_id)
+        return removed
     
     async def is_admin(self, user_id: int):
         """Check if user is admin or owner"""
         if user_id == AMANBOTZ_OWNER_ID:
             return True
+        if self.synced:
+            return user_id in self.admin_ids
         admin = await self.admins.find_one({"user_id": user_id})
         return admin is not None
     
@@ -83,22 +358,22 @@ class AmanbotzDatabase:
     # ============ Ban Operations ============
     async def ban_user(self, user_id: int):
         """Ban a user"""
-        banned = await self.banned_users.find_one({"user_id": user_id})
-        if not banned:
-            await self.banned_users.insert_one({
-                "user_id": user_id,
-                "banned_date": datetime.now()
-            })
-            return True
-        return False
+        banned = await self._insert_if_missing(self.banned_users, {"user_id": user_id}, {
+            "banned_date": datetime.now()
+        }, counter="banned")
+        self.banned_ids.add(user_id)
+        return banned
     
     async def unban_user(self, user_id: int):
         """Unban a user"""
-        result = await self.banned_users.delete_one({"user_id": user_id})
-        return result.deleted_count > 0
+        unbanned = await self._delete(self.banned_users, {"user_id": user_id}, counter="banned")
+        self.banned_ids.discard(user_id)
+        return unbanned
     
     async def is_banned(self, user_id: int):
         """Check if user is banned"""
+        if self.synced:
+            return user_id in self.banned_ids
         banned = await self.banned_users.find_one({"user_id": user_id})
         return banned is not None
     
@@ -106,29 +381,118 @@ class AmanbotzDatabase:
         """Get total banned users count"""
         return await self.banned_users.count_documents({})
     
+    # ============ In-Memory Sync ============
+    async def reload_banned(self):
+        """Reload the in-memory ban list"""
+        cursor = self.banned_users.find({}, {"user_id": 1, "_id": 0})
+        self.banned_ids = {doc["user_id"] async for doc in cursor}
+    
+    async def reload_admins(self):
+        """Reload the in-memory admin list"""
+        cursor = self.admins.find({}, {"user_id": 1, "_id": 0})
+        self.admin_ids = {doc["user_id"] async for doc in cursor}
+    
+    async def reload_settings(self):
+        """Reload the in-memory settings snapshot"""
+        settings = await self.settings.find_one({"_id": "bot_settings"})
+        if settings:
+            self._apply_settings(settings)
+    
+    async def load_posted_ids(self):
+        """Load the IDs of all posted movies"""
+        cursor = self.posted_movies.find({}, {"movie_id": 1, "_id": 0})
+        self.posted_ids = {doc["movie_id"] async for doc in cursor}
+    
+    async def start_sync(self):
+        """Load ban/admin lists and settings, and keep them in sync with other replicas"""
+        await self.reload_banned()
+        await self.reload_admins()
+        await self.get_settings()
+        await self.load_posted_ids()
+        self.synced = True
+        self._sync_tasks = [
+            asyncio.create_task(self._sync_collection(self.banned_users, self.reload_banned)),
+            asyncio.create_task(self._sync_collection(self.admins, self.reload_admins)),
+            asyncio.create_task(self._sync_collection(
+                self.settings,
+                self.reload_settings,
+                # Counter updates share the collection but don't touch settings
+                [{"$match": {"documentKey._id": "bot_settings"}}]
+            ))
+        ]
+    
+    async def stop_sync(self):
+        """Stop watching for ban/admin/settings changes"""
+        for task in self._sync_tasks:
+            task.cancel()
+        await asyncio.gather(*self._sync_tasks, return_exceptions=True)
+        self._sync_tasks = []
+    
+    async def _sync_collection(self, collection, reload, pipeline: list = None):
+        """Reload on every change stream event, or poll if streams are unsupported"""
+        use_stream = True
+        while True:
+            if use_stream:
+                try:
+                    async with collection.watch(pipeline) as stream:
+                        async for _ in stream:
+                            await reload()
+                except OperationFailure as e:
+                    # Standalone servers don't support change streams
+                    logger.info(f"Change streams unavailable for {collection.name}, polling instead: {e}")
+                    use_stream = False
+                except Exception as e:
+                    logger.warning(f"Change stream for {collection.name} interrupted: {e}")
+            
+            # Catch up on anything missed, then wait before retrying
+            await asyncio.sleep(AMANBOTZ_MEMBERSHIP_POLL)
+            try:
+                await reload()
+            except Exception as e:
+                logger.warning(f"Reloading {collection.name} failed: {e}")
+    
     # ============ Settings Operations ============
+    DEFAULT_SETTINGS = {
+        "auto_post_channel": 0,
+        "auto_post_enabled": False,
+        "check_interval": 6
+    }
+    
+    def _apply_settings(self, settings: dict):
+        """Replace the snapshot unless it is already newer"""
+        current = self.settings_snapshot
+        if current is None or settings.get("version", 0) >= current.get("version", 0):
+            self.settings_snapshot = settings
+        return self.settings_snapshot
+    
     async def get_settings(self):
         """Get bot settings"""
-        settings = await self.settings.find_one({"_id": "bot_settings"})
-        if not settings:
-            # Create default settings
-            default_settings = {
-                "_id": "bot_settings",
-                "auto_post_channel": 0,
-                "auto_post_enabled": False,
-                "check_interval": 6
-            }
-            await self.settings.insert_one(default_settings)
-            return default_settings
-        return settings
+        # Served from memory while the snapshot is kept in sync
+        if self.synced and self.settings_snapshot is not None:
+            return dict(self.settings_snapshot)
+        
+        # Create default settings if missing, in one round trip
+        settings = await self.settings.find_one_and_update(
+            {"_id": "bot_settings"},
+            {"$setOnInsert": dict(self.DEFAULT_SETTINGS, version=0)},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return dict(self._apply_settings(settings))
     
     async def update_setting(self, key: str, value):
         """Update a specific setting"""
-        await self.settings.update_one(
+        defaults = {k: v for k, v in self.DEFAULT_SETTINGS.items() if k != key}
+        update = {"$set": {key: value}, "$inc": {"version": 1}}
+        if defaults:
+            update["$setOnInsert"] = defaults
+        settings = await self.settings.find_one_and_update(
             {"_id": "bot_settings"},
-            {"$set": {key: value}},
-            upsert=True
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
         )
+        self._apply_settings(settings)
     
     async def get_auto_post_channel(self):
         """Get the auto-post channel ID"""
@@ -146,29 +510,312 @@ class AmanbotzDatabase:
     
     async def toggle_auto_post(self):
         """Toggle auto-posting"""
-        settings = await self.get_settings()
-        new_value = not settings.get("auto_post_enabled", False)
-        await self.update_setting("auto_post_enabled", new_value)
-        return new_value
+        # Flip the stored value atomically instead of read-modify-write
+        settings = await self.settings.find_one_and_update(
+            {"_id": "bot_settings"},
+            [{"$set": {
+                "auto_post_enabled": {"$not": [{"$ifNull": ["$auto_post_enabled", False]}]},
+                "auto_post_channel": {"$ifNull": ["$auto_post_channel", 0]},
+                "check_interval": {"$ifNull": ["$check_interval", 6]},
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return self._apply_settings(settings).get("auto_post_enabled", False)
     
     # ============ Posted Movies Operations ============
     async def is_movie_posted(self, movie_id: str):
         """Check if a movie has already been posted"""
-        movie = await self.posted_movies.find_one({"movie_id": movie_id})
-        return movie is not None
+        return movie_id in await self.get_posted_movie_ids([movie_id])
+    
+    async def get_posted_movie_ids(self, movie_ids: list):
+        """Get the subset of movie IDs that have already been posted"""
+        posted = {movie_id for movie_id in movie_ids if movie_id in self.posted_ids}
+        unknown = [movie_id for movie_id in movie_ids if movie_id not in posted]
+        if unknown:
+            # Another replica may have posted them since we loaded
+            cursor = self.posted_movies.find({"movie_id": {"$in": unknown}}, {"movie_id": 1, "_id": 0})
+            found = {doc["movie_id"] async for doc in cursor}
+            self.posted_ids.update(found)
+            posted.update(found)
+        return posted
     
     async def mark_movie_posted(self, movie_id: str, title: str):
         """Mark a movie as posted"""
-        await self.posted_movies.insert_one({
-            "movie_id": movie_id,
+        await self._insert_if_missing(self.posted_movies, {"movie_id": movie_id}, {
             "title": title,
             "posted_date": datetime.now()
-        })
+        }, counter="posted")
+        self.posted_ids.add(movie_id)
     
     async def get_posted_count(self):
         """Get total posted movies count"""
         return await self.posted_movies.count_documents({})
+    
+    # ============ Stats Operations ============
+    async def _bump_counters(self, **deltas):
+        """Adjust the maintained stats counters"""
+        await self.settings.update_one({"_id": "counters"}, {"$inc": deltas}, upsert=True)
+    
+    async def recount_stats(self):
+        """Rebuild the stats counters from the collections"""
+        await self.settings.update_one(
+            {"_id": "counters"},
+            {"$set": {
+                "users": await self.users.count_documents({}),
+                "admins": await self.admins.count_documents({}),
+                "banned": await self.banned_users.count_documents({}),
+                "posted": await self.posted_movies.count_documents({})
+            }},
+            upsert=True
+        )
+    
+    async def get_stats(self, estimated: bool = None):
+        """Get all stats counters and settings in one query"""
+        if estimated is None:
+            estimated = AMANBOTZ_STATS_ESTIMATED
+        
+        docs = {
+            doc["_id"]: doc
+            async for doc in self.settings.find({"_id": {"$in": ["bot_settings", "counters"]}})
+        }
+        counters = docs.get("counters")
+        if estimated or counters is None:
+            users, admins, banned, posted = await asyncio.gather(
+                self.users.estimated_document_count(),
+                self.admins.estimated_document_count(),
+                self.banned_users.estimated_document_count(),
+                self.posted_movies.estimated_document_count()
+            )
+            counters = {"users": users, "admins": admins, "banned": banned, "posted": posted}
+        
+        return {
+            "total_users": counters.get("users", 0),
+            "total_admins": counters.get("admins", 0),
+            "banned_users": counters.get("banned", 0),
+            "movies_posted": counters.get("posted", 0),
+            "settings": docs.get("bot_settings") or dict(self.DEFAULT_SETTINGS)
+        }
+    
+    # ============ Broadcast Job Operations ============
+    async def create_broadcast_job(self, from_chat_id: int, message_id: int, total: int,
+                                   status_chat_id: int = None, status_message_id: int = None,
+                                   sharded: bool = False, owner: str = None, lease_seconds: int = 0):
+        """Save a new broadcast job and return it (held by owner for lease_seconds, if given)"""
+        now = datetime.now()
+        job = {
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "status_chat_id": status_chat_id,
+            "status_message_id": status_message_id,
+            "status": "queued",
+            "sharded": sharded,
+            # Sharded jobs are split in the background; workers wait until this is set
+            "shards_ready": False,
+            "owner": owner,
+            "lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds) if owner else None,
+            "cursor": None,
+            "sent": 0,
+            "failed": 0,
+            "total": total,
+            "created_date": now,
+            "updated_date": now
+        }
+        result = await self.broadcast_jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        return job
+    
+    async def update_broadcast_job(self, job_id, holder: str = None, **fields):
+        """
+        Update a broadcast job's checkpoint, counters or status
+        With holder, only while that process holds the job; returns False otherwise
+        """
+        fields["updated_date"] = datetime.now()
+        query = {"_id": job_id}
+        if holder:
+            query["owner"] = holder
+        result = await self.broadcast_jobs.update_one(query, {"$set": fields})
+        return result.matched_count == 1
+    
+    async def claim_broadcast_job(self, job_id, worker_id: str, lease_seconds: int):
+        """Take or renew an unfinished job for lease_seconds; False if another process holds it"""
+        now = datetime.utcnow()
+        result = await self.broadcast_jobs.update_one(
+            {
+                "_id": job_id,
+                "status": {"$in": ["queued", "running", "paused"]},
+                "$or": [
+                    {"owner": None},
+                    {"owner": worker_id},
+                    {"lease_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {"owner": worker_id, "lease_until": now + timedelta(seconds=lease_seconds)}}
+        )
+        return result.matched_count == 1
+    
+    async def get_unfinished_broadcast_jobs(self):
+        """Get broadcast jobs that have not finished, oldest first"""
+        query = {"status": {"$in": ["queued", "running", "paused"]}}
+        cursor = self.broadcast_jobs.find(query).sort("created_date", ASCENDING)
+        return [job async for job in cursor]
+    
+    async def get_broadcast_job(self, job_id):
+        """Get a broadcast job by its ID"""
+        return await self.broadcast_jobs.find_one({"_id": job_id})
+    
+    async def add_broadcast_job_counts(self, job_id, sent: int = 0, failed: int = 0):
+        """Add shard results to a broadcast job's counters"""
+        await self.broadcast_jobs.update_one(
+            {"_id": job_id},
+            {"$inc": {"sent": sent, "failed": failed}, "$set": {"updated_date": datetime.now()}}
+        )
+    
+    async def finish_broadcast_job(self, job_id):
+        """Mark a sharded job done once no shard is left; True only for the caller that did it"""
+        if await self.broadcast_shards.count_documents({"job_id": job_id, "status": {"$ne": "done"}}, limit=1):
+            return False
+        result = await self.broadcast_jobs.update_one(
+            {"_id": job_id, "shards_ready": True, "status": {"$in": ["queued", "running"]}},
+            {"$set": {"status": "done", "updated_date": datetime.now()}}
+        )
+        return result.modified_count == 1
+    
+    # ============ Broadcast Shard Operations ============
+    async def create_broadcast_shards(self, job_id, shard_size: int):
+        """Split the user ID range into shards of about shard_size users, then mark the job ready"""
+        # One $bucketAuto pass finds the boundaries instead of a skip() per shard
+        total = await self.users.estimated_document_count()
+        pipeline = [{"$bucketAuto": {
+            "groupBy": "$user_id",
+            "buckets": max(1, -(-total // shard_size)),
+            "output": {"last": {"$max": "$user_id"}}
+        }}]
+        buckets = [bucket async for bucket in self.users.aggregate(pipeline, allowDiskUse=True)]
+        # Each shard ends at its bucket's highest ID; the last shard is open-ended
+        bounds = [None] + [bucket["last"] for bucket in buckets[:-1]] + [None]
+        
+        shards = [
+            {
+                "job_id": job_id,
+                "index": index,
+                "start_after": bounds[index],
+                "end": bounds[index + 1],
+                "cursor": None,
+                "status": "pending",
+                "owner": None,
+                "lease_until": None,
+                "sent": 0,
+                "failed": 0
+            }
+            for index in range(len(bounds) - 1)
+        ]
+        # Clear what an interrupted split left behind
+        await self.broadcast_shards.delete_many({"job_id": job_id})
+        await self.broadcast_shards.insert_many(shards)
+        await self.update_broadcast_job(job_id, shards_ready=True, owner=None, lease_until=None)
+        return len(shards)
+    
+    async def lease_broadcast_shard(self, job_ids: list, worker_id: str, lease_seconds: int):
+        """Claim a pending shard, or one whose lease expired, for lease_seconds"""
+        now = datetime.utcnow()
+        return await self.broadcast_shards.find_one_and_update(
+            {
+                "job_id": {"$in": job_ids},
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "leased", "lease_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {
+                "status": "leased",
+                "owner": worker_id,
+                "lease_until": now + timedelta(seconds=lease_seconds)
+            }},
+            sort=[("job_id", ASCENDING), ("index", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def update_broadcast_shard(self, shard_id, worker_id: str, lease_seconds: int = None,
+                                     status: str = None, **fields):
+        """
+        Save a leased shard's progress, extending the lease or setting its status
+        status="pending" hands it back, status="done" finishes it
+        Returns False if the lease was lost to another worker
+        """
+        if lease_seconds:
+            fields["lease_until"] = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        if status:
+            fields["status"] = status
+            if status != "leased":
+                fields["owner"] = None
+                fields["lease_until"] = None
+        result = await self.broadcast_shards.update_one(
+            {"_id": shard_id, "owner": worker_id, "status": "leased"},
+            {"$set": fields}
+        )
+        return result.matched_count == 1
+    
+    async def count_broadcast_workers(self):
+        """Count the processes holding an unexpired shard lease"""
+        owners = await self.broadcast_shards.distinct(
+            "owner",
+            {"status": "leased", "lease_until": {"$gt": datetime.utcnow()}}
+        )
+        return len(owners)
+    
+    async def get_active_sharded_job_ids(self):
+        """Get IDs of sharded broadcast jobs that workers should be sending"""
+        cursor = self.broadcast_jobs.find(
+            {"sharded": True, "shards_ready": True, "status": {"$in": ["queued", "running"]}},
+            {"_id": 1}
+        )
+        return [job["_id"] async for job in cursor]
+    
+    # ============ API Cache Operations ============
+    async def setup_api_cache(self):
+        """Create the TTL index that expires cached API responses"""
+        await self.api_cache.create_index("expires_at", expireAfterSeconds=0)
+    
+    async def get_api_cache(self, key: str):
+        """Get a cached API response if it has not expired"""
+        entry = await self.api_cache.find_one({
+            "_id": key,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        return entry["value"] if entry else None
+    
+    async def set_api_cache(self, key: str, value, ttl: int):
+        """Store an API response for ttl seconds"""
+        await self.api_cache.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+    
+    # ============ Poster File Operations ============
+    async def get_poster_file_ids(self, poster_urls: list):
+        """Get the Telegram file_ids saved for a list of poster URLs"""
+        entries = self.poster_files.find({"_id": {"$in": list(poster_urls)}})
+        return {entry["_id"]: entry["file_id"] async for entry in entries}
+    
+    async def set_poster_file_id(self, poster_url: str, file_id: str):
+        """Save the Telegram file_id of an uploaded poster"""
+        await self.poster_files.update_one(
+            {"_id": poster_url},
+            {"$set": {"file_id": file_id, "saved_date": datetime.now()}},
+            upsert=True
+        )
+    
+    async def delete_poster_file_id(self, poster_url: str):
+        """Forget a file_id that Telegram no longer accepts"""
+        await self.poster_files.delete_one({"_id": poster_url})
 
 
 # Create database instance
-amanbotz_db = AmanbotzDatabase()
+if AMANBOTZ_DB_BACKEND == "sqlite":
+    from database_sqlite import AmanbotzSQLiteDatabase
+    amanbotz_db = AmanbotzSQLiteDatabase(AMANBOTZ_SQLITE_PATH)
+else:
+    amanbotz_db = AmanbotzDatabase()
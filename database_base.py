@@ -0,0 +1,264 @@
+"""
+Database Interface for Poster Bot
+Methods every storage backend (MongoDB, SQLite) must provide,
+plus the shard leasing that only MongoDB offers
+"""
+
+from abc import ABC, abstractmethod
+
+
+class AmanbotzDatabaseBase(ABC):
+    # ============ Connection ============
+    @abstractmethod
+    async def close(self):
+        """Close the database"""
+    
+    @abstractmethod
+    def get_command_stats(self, top: int = None):
+        """Get command latency metrics, or None if the backend has none"""
+    
+    @abstractmethod
+    async def setup_schema(self):
+        """Create tables/indexes and apply pending migrations"""
+    
+    # ============ User Operations ============
+    @abstractmethod
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None):
+        """Add or refresh a user right away; True if the user is new"""
+    
+    @abstractmethod
+    def queue_user(self, user_id: int, username: str = None, first_name: str = None, register: bool = True):
+        """Buffer a user upsert for the next write-behind flush"""
+    
+    @abstractmethod
+    async def flush_users(self):
+        """Write buffered user upserts"""
+    
+    @abstractmethod
+    def queue_dead_user(self, user_id: int, reason: str):
+        """Buffer a user who blocked the bot or was deleted, for removal"""
+    
+    @abstractmethod
+    async def flush_dead_users(self):
+        """Remove (or archive) buffered dead users"""
+    
+    @abstractmethod
+    def start_write_behind(self):
+        """Start flushing buffered writes in the background"""
+    
+    @abstractmethod
+    async def stop_write_behind(self):
+        """Stop the write-behind loop and flush what is left"""
+    
+    @abstractmethod
+    async def get_all_users(self):
+        """Get all user IDs"""
+    
+    @abstractmethod
+    async def iter_user_ids(self, batch_size: int = 1000, start_after: int = None, end: int = None):
+        """Stream user IDs in ascending order (up to end, inclusive)"""
+    
+    @abstractmethod
+    async def get_users_count(self):
+        """Get total user count"""
+    
+    @abstractmethod
+    async def delete_user(self, user_id: int):
+        """Delete a user from database"""
+    
+    # ============ Admin Operations ============
+    @abstractmethod
+    async def add_admin(self, user_id: int):
+        """Add a new admin"""
+    
+    @abstractmethod
+    async def remove_admin(self, user_id: int):
+        """Remove an admin"""
+    
+    @abstractmethod
+    async def is_admin(self, user_id: int):
+        """Check if user is admin or owner"""
+    
+    @abstractmethod
+    async def get_all_admins(self):
+        """Get all admin IDs"""
+    
+    @abstractmethod
+    async def get_admins_count(self):
+        """Get total admins count"""
+    
+    # ============ Ban Operations ============
+    @abstractmethod
+    async def ban_user(self, user_id: int):
+        """Ban a user"""
+    
+    @abstractmethod
+    async def unban_user(self, user_id: int):
+        """Unban a user"""
+    
+    @abstractmethod
+    async def is_banned(self, user_id: int):
+        """Check if user is banned"""
+    
+    @abstractmethod
+    async def get_banned_count(self):
+        """Get total banned users count"""
+    
+    # ============ In-Memory Sync ============
+    @abstractmethod
+    async def reload_banned(self):
+        """Reload the banned user list into memory"""
+    
+    @abstractmethod
+    async def reload_admins(self):
+        """Reload the admin list into memory"""
+    
+    @abstractmethod
+    async def reload_settings(self):
+        """Reload the settings snapshot into memory"""
+    
+    @abstractmethod
+    async def load_posted_ids(self):
+        """Load known posted movie IDs into memory"""
+    
+    @abstractmethod
+    async def start_sync(self):
+        """Load in-memory lists and keep them in sync"""
+    
+    @abstractmethod
+    async def stop_sync(self):
+        """Stop keeping in-memory lists in sync"""
+    
+    # ============ Settings Operations ============
+    @abstractmethod
+    async def get_settings(self):
+        """Get bot settings"""
+    
+    @abstractmethod
+    async def update_setting(self, key: str, value):
+        """Update a bot setting"""
+    
+    @abstractmethod
+    async def get_auto_post_channel(self):
+        """Get auto-post channel ID"""
+    
+    @abstractmethod
+    async def set_auto_post_channel(self, channel_id: int):
+        """Set auto-post channel ID"""
+    
+    @abstractmethod
+    async def is_auto_post_enabled(self):
+        """Check if auto-posting is enabled"""
+    
+    @abstractmethod
+    async def toggle_auto_post(self):
+        """Toggle auto-posting and return the new state"""
+    
+    # ============ Posted Movies Operations ============
+    @abstractmethod
+    async def is_movie_posted(self, movie_id: str):
+        """Check if a movie was already posted"""
+    
+    @abstractmethod
+    async def get_posted_movie_ids(self, movie_ids: list):
+        """Get which of the given movie IDs were already posted"""
+    
+    @abstractmethod
+    async def mark_movie_posted(self, movie_id: str, title: str):
+        """Mark a movie as posted"""
+    
+    @abstractmethod
+    async def get_posted_count(self):
+        """Get total posted movies count"""
+    
+    # ============ Stats Operations ============
+    @abstractmethod
+    async def recount_stats(self):
+        """Rebuild stat counters from the data"""
+    
+    @abstractmethod
+    async def get_stats(self, estimated: bool = None):
+        """Get bot statistics and settings"""
+    
+    # ============ Broadcast Job Operations ============
+    @abstractmethod
+    async def create_broadcast_job(self, from_chat_id: int, message_id: int, total: int,
+                                   status_chat_id: int = None, status_message_id: int = None,
+                                   sharded: bool = False, owner: str = None, lease_seconds: int = 0):
+        """Save a new broadcast job and return it (held by owner for lease_seconds, if given)"""
+    
+    @abstractmethod
+    async def update_broadcast_job(self, job_id, holder: str = None, **fields):
+        """Update a broadcast job; with holder, only while that process holds it"""
+    
+    @abstractmethod
+    async def claim_broadcast_job(self, job_id, worker_id: str, lease_seconds: int):
+        """Take or renew an unfinished job; False if another process holds it"""
+    
+    @abstractmethod
+    async def get_unfinished_broadcast_jobs(self):
+        """Get broadcast jobs that have not finished, oldest first"""
+    
+    @abstractmethod
+    async def get_broadcast_job(self, job_id):
+        """Get a broadcast job by its ID"""
+    
+    @abstractmethod
+    async def add_broadcast_job_counts(self, job_id, sent: int = 0, failed: int = 0):
+        """Add results to a broadcast job's counters"""
+    
+    # ============ API Cache Operations ============
+    @abstractmethod
+    async def setup_api_cache(self):
+        """Prepare expiry of cached API responses"""
+    
+    @abstractmethod
+    async def get_api_cache(self, key: str):
+        """Get a cached API response if it has not expired"""
+    
+    @abstractmethod
+    async def set_api_cache(self, key: str, value, ttl: int):
+        """Store an API response for ttl seconds"""
+    
+    # ============ Poster File Operations ============
+    @abstractmethod
+    async def get_poster_file_ids(self, poster_urls: list):
+        """Get the Telegram file_ids saved for a list of poster URLs"""
+    
+    @abstractmethod
+    async def set_poster_file_id(self, poster_url: str, file_id: str):
+        """Save the Telegram file_id of an uploaded poster"""
+    
+    @abstractmethod
+    async def delete_poster_file_id(self, poster_url: str):
+        """Forget a file_id that Telegram no longer accepts"""
+
+
+# Only backends whose leases every worker process can see (MongoDB) implement this;
+# without it, broadcasts are sent from one process
+class AmanbotzShardingMixin(ABC):
+    # ============ Broadcast Shard Operations ============
+    @abstractmethod
+    async def finish_broadcast_job(self, job_id):
+        """Mark a sharded job done once no shard is left"""
+    
+    @abstractmethod
+    async def create_broadcast_shards(self, job_id, shard_size: int):
+        """Split the user ID range into shards of about shard_size users"""
+    
+    @abstractmethod
+    async def lease_broadcast_shard(self, job_ids: list, worker_id: str, lease_seconds: int):
+        """Claim a pending shard, or one whose lease expired"""
+    
+    @abstractmethod
+    async def update_broadcast_shard(self, shard_id, worker_id: str, lease_seconds: int = None,
+                                     status: str = None, **fields):
+        """Save a leased shard's progress; False if the lease was lost"""
+    
+    @abstractmethod
+    async def count_broadcast_workers(self):
+        """Count the processes holding an unexpired shard lease"""
+    
+    @abstractmethod
+    async def get_active_sharded_job_ids(self):
+        """Get IDs of sharded broadcast jobs that workers should be sending"""
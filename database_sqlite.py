@@ -0,0 +1,607 @@
+"""
+SQLite Database Handler for Poster Bot
+Embedded alternative to MongoDB for single-instance deployments
+Implements AmanbotzDatabaseBase; sharded broadcasts need MongoDB
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import AMANBOTZ_OWNER_ID, AMANBOTZ_USER_FLUSH_SIZE, AMANBOTZ_USER_FLUSH_MS, AMANBOTZ_USER_SOFT_DELETE
+from database_base import AmanbotzDatabaseBase
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        joined_date TEXT,
+        last_seen TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS admins (
+        user_id INTEGER PRIMARY KEY,
+        added_date TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS banned_users (
+        user_id INTEGER PRIMARY KEY,
+        banned_date TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS posted_movies (
+        movie_id TEXT PRIMARY KEY,
+        title TEXT,
+        posted_date TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS api_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS poster_files (
+        poster_url TEXT PRIMARY KEY,
+        file_id TEXT NOT NULL,
+        saved_date TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS deleted_users (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        joined_date TEXT,
+        last_seen TEXT,
+        deleted_reason TEXT,
+        deleted_date TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS broadcast_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS api_cache_expires ON api_cache (expires_at)"
+]
+
+
+class AmanbotzSQLiteDatabase(AmanbotzDatabaseBase):
+    DEFAULT_SETTINGS = {
+        "auto_post_channel": 0,
+        "auto_post_enabled": False,
+        "check_interval": 6
+    }
+    
+    def __init__(self, path: str):
+        self.path = path
+        # One thread owns the connection, so calls are serialized like a lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = None
+        
+        # Write-behind buffer of user upserts, keyed by user_id
+        self._user_buffer = {}
+        # Users who blocked the bot or were deleted: user_id -> reason
+        self._dead_users = {}
+        self._flush_wakeup = asyncio.Event()
+        self._write_behind_stopping = False
+        self._write_behind_task = None
+    
+    # ============ Connection ============
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+        return self._conn
+    
+    async def _run(self, func, *args):
+        """Run a blocking function on the database thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(self._connect(), *args))
+    
+    async def _execute(self, sql: str, params: tuple = ()):
+        """Execute a statement and return the cursor's rowcount"""
+        return await self._run(lambda conn: conn.execute(sql, params).rowcount)
+    
+    async def _fetchone(self, sql: str, params: tuple = ()):
+        return await self._run(lambda conn: conn.execute(sql, params).fetchone())
+    
+    async def _fetchall(self, sql: str, params: tuple = ()):
+        return await self._run(lambda conn: conn.execute(sql, params).fetchall())
+    
+    async def close(self):
+        """Close the database"""
+        await self._run(lambda conn: conn.close())
+        self._conn = None
+        self._executor.shutdown(wait=False)
+    
+    def get_command_stats(self, top: int = None):
+        """Command metrics are only collected for MongoDB"""
+        return None
+    
+    # ============ Schema Bootstrap ============
+    async def setup_schema(self):
+        """Create tables and indexes"""
+        def setup(conn):
+            for statement in SCHEMA:
+                conn.execute(statement)
+        await self._run(setup)
+    
+    # ============ User Operations ============
+    async def add_user(self, user_id: int, username: str = None, first_name: str = None):
+        """Add a new user to the database"""
+        now = datetime.now().isoformat()
+        inserted = await self._execute(
+            "INSERT OR IGNORE INTO users (user_id, username, first_name, joined_date, last_seen) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, username, first_name, now, now)
+        )
+        return inserted > 0
+    
+    def queue_user(self, user_id: int, username: str = None, first_name: str = None, register: bool = True):
+        """
+        Buffer a user registration (or, with register=False, a last_seen
+        update for an existing user) to be written in the next batch
+        """
+        pending = self._user_buffer.get(user_id)
+        self._user_buffer[user_id] = {
+            "username": username if username is not None else (pending or {}).get("username"),
+            "first_name": first_name if first_name is not None else (pending or {}).get("first_name"),
+            "last_seen": datetime.now().isoformat(),
+            "register": register or bool(pending and pending["register"])
+        }
+        if len(self._user_buffer) >= AMANBOTZ_USER_FLUSH_SIZE:
+            self._flush_wakeup.set()
+    
+    async def flush_users(self):
+        """Write all buffered user updates in one transaction"""
+        if not self._user_buffer:
+            return
+        
+        buffer, self._user_buffer = self._user_buffer, {}
+        
+        def flush(conn):
+            with conn:
+                conn.execute("BEGIN")
+                for user_id, entry in buffer.items():
+                    if entry["register"]:
+                        conn.execute(
+                            "INSERT INTO users (user_id, username, first_name, joined_date, last_seen) "
+                            "VALUES (?, ?, ?, ?, ?) ON CONFLICT (user_id) DO UPDATE SET "
+                            "username = COALESCE(excluded.username, username), "
+                            "first_name = COALESCE(excluded.first_name, first_name), "
+                            "last_seen = excluded.last_seen",
+                            (user_id, entry["username"], entry["first_name"], entry["last_seen"], entry["last_seen"])
+                        )
+                    else:
+                        conn.execute(
+                            "UPDATE users SET last_seen = ? WHERE user_id = ?",
+                            (entry["last_seen"], user_id)
+                        )
+        
+        try:
+            await self._run(flush)
+        except Exception as e:
+            logger.error(f"User flush failed, retrying next batch: {e}")
+            for user_id, entry in buffer.items():
+                self._user_buffer.setdefault(user_id, entry)
+    
+    def queue_dead_user(self, user_id: int, reason: str):
+        """Buffer a user who can no longer be reached, to be removed in the next batch"""
+        self._user_buffer.pop(user_id, None)
+        self._dead_users[user_id] = reason
+        if len(self._dead_users) >= AMANBOTZ_USER_FLUSH_SIZE:
+            self._flush_wakeup.set()
+    
+    async def flush_dead_users(self):
+        """Remove all buffered dead users in one transaction"""
+        if not self._dead_users:
+            return
+        
+        buffer, self._dead_users = self._dead_users, {}
+        deleted_date = datetime.now().isoformat()
+        
+        def flush(conn):
+            with conn:
+                conn.execute("BEGIN")
+                if AMANBOTZ_USER_SOFT_DELETE:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO deleted_users "
+                        "SELECT user_id, username, first_name, joined_date, last_seen, ?, ? "
+                        "FROM users WHERE user_id = ?",
+                        [(reason, deleted_date, user_id) for user_id, reason in buffer.items()]
+                    )
+                conn.executemany("DELETE FROM users WHERE user_id = ?", [(user_id,) for user_id in buffer])
+        
+        try:
+            await self._run(flush)
+        except Exception as e:
+            logger.error(f"Dead user flush failed, retrying next batch: {e}")
+            for user_id, reason in buffer.items():
+                self._dead_users.setdefault(user_id, reason)
+    
+    async def _write_behind_loop(self):
+        while not self._write_behind_stopping:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=AMANBOTZ_USER_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush_users()
+            await self.flush_dead_users()
+    
+    def start_write_behind(self):
+        """Start flushing buffered user updates in the background"""
+        if self._write_behind_task is None:
+            self._write_behind_stopping = False
+            self._write_behind_task = asyncio.create_task(self._write_behind_loop())
+    
+    async def stop_write_behind(self):
+        """Stop the background flusher and write whatever is left"""
+        if self._write_behind_task:
+            # Never cancel a flush midway: its batch is already out of the buffers
+            self._write_behind_stopping = True
+            self._flush_wakeup.set()
+            await asyncio.gather(self._write_behind_task, return_exceptions=True)
+            self._write_behind_task = None
+        await self.flush_users()
+        await self.flush_dead_users()
+    
+    async def get_all_users(self):
+        """Get all user IDs"""
+        return [user_id async for user_id in self.iter_user_ids()]
+    
+    async def iter_user_ids(self, batch_size: int = 1000, start_after: int = None, end: int = None):
+        """Stream user IDs in ascending order, one batch at a time (up to end, inclusive)"""
+        last_id = start_after
+        while True:
+            conditions, params = [], []
+            if last_id is not None:
+                conditions.append("user_id > ?")
+                params.append(last_id)
+            if end is not None:
+                conditions.append("user_id <= ?")
+                params.append(end)
+            where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+            rows = await self._fetchall(
+                f"SELECT user_id FROM users {where}ORDER BY user_id LIMIT ?",
+                (*params, batch_size)
+            )
+            for row in rows:
+                yield row["user_id"]
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]["user_id"]
+    
+    async def get_users_count(self):
+        """Get total user count"""
+        return (await self._fetchone("SELECT COUNT(*) FROM users"))[0]
+    
+    async def delete_user(self, user_id: int):
+        """Delete a user from database"""
+        await self._execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+    
+    # ============ Admin Operations ============
+    async def add_admin(self, user_id: int):
+        """Add a new admin"""
+        inserted = await self._execute(
+            "INSERT OR IGNORE INTO admins (user_id, added_date) VALUES (?, ?)",
+            (user_id, datetime.now().isoformat())
+        )
+        return inserted > 0
+    
+    async def remove_admin(self, user_id: int):
+        """Remove an admin"""
+        return await self._execute("DELETE FROM admins WHERE user_id = ?", (user_id,)) > 0
+    
+    async def is_admin(self, user_id: int):
+        """Check if user is admin or owner"""
+        if user_id == AMANBOTZ_OWNER_ID:
+            return True
+        return await self._fetchone("SELECT 1 FROM admins WHERE user_id = ?", (user_id,)) is not None
+    
+    async def get_all_admins(self):
+        """Get all admin IDs"""
+        return [row["user_id"] for row in await self._fetchall("SELECT user_id FROM admins")]
+    
+    async def get_admins_count(self):
+        """Get total admin count"""
+        return (await self._fetchone("SELECT COUNT(*) FROM admins"))[0]
+    
+    # ============ Ban Operations ============
+    async def ban_user(self, user_id: int):
+        """Ban a user"""
+        inserted = await self._execute(
+            "INSERT OR IGNORE INTO banned_users (user_id, banned_date) VALUES (?, ?)",
+            (user_id, datetime.now().isoformat())
+        )
+        return inserted > 0
+    
+    async def unban_user(self, user_id: int):
+        """Unban a user"""
+        return await self._execute("DELETE FROM banned_users WHERE user_id = ?", (user_id,)) > 0
+    
+    async def is_banned(self, user_id: int):
+        """Check if user is banned"""
+        return await self._fetchone("SELECT 1 FROM banned_users WHERE user_id = ?", (user_id,)) is not None
+    
+    async def get_banned_count(self):
+        """Get total banned users count"""
+        return (await self._fetchone("SELECT COUNT(*) FROM banned_users"))[0]
+    
+    # ============ In-Memory Sync ============
+    async def reload_banned(self):
+        """Nothing cached: ban checks read the database"""
+    
+    async def reload_admins(self):
+        """Nothing cached: admin checks read the database"""
+    
+    async def reload_settings(self):
+        """Nothing cached: settings are read from the database"""
+    
+    async def load_posted_ids(self):
+        """Nothing cached: posted checks read the database"""
+    
+    async def start_sync(self):
+        """Nothing to sync: there is only one instance and lookups are local"""
+    
+    async def stop_sync(self):
+        """Nothing to stop"""
+    
+    # ============ Settings Operations ============
+    def _read_settings(self, conn):
+        row = conn.execute("SELECT data FROM settings WHERE key = 'bot_settings'").fetchone()
+        if row:
+            return json.loads(row["data"])
+        settings = dict(self.DEFAULT_SETTINGS, _id="bot_settings", version=0)
+        conn.execute(
+            "INSERT OR IGNORE INTO settings (key, data) VALUES ('bot_settings', ?)",
+            (json.dumps(settings),)
+        )
+        return settings
+    
+    def _modify_settings(self, conn, modify):
+        """Read, change and write the settings in one transaction"""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            settings = self._read_settings(conn)
+            modify(settings)
+            settings["version"] = settings.get("version", 0) + 1
+            conn.execute(
+                "UPDATE settings SET data = ? WHERE key = 'bot_settings'",
+                (json.dumps(settings),)
+            )
+        return settings
+    
+    async def get_settings(self):
+        """Get bot settings"""
+        return await self._run(self._read_settings)
+    
+    async def update_setting(self, key: str, value):
+        """Update a specific setting"""
+        await self._run(lambda conn: self._modify_settings(conn, lambda s: s.update({key: value})))
+    
+    async def get_auto_post_channel(self):
+        """Get the auto-post channel ID"""
+        settings = await self.get_settings()
+        return settings.get("auto_post_channel", 0)
+    
+    async def set_auto_post_channel(self, channel_id: int):
+        """Set the auto-post channel ID"""
+        await self.update_setting("auto_post_channel", channel_id)
+    
+    async def is_auto_post_enabled(self):
+        """Check if auto-posting is enabled"""
+        settings = await self.get_settings()
+        return settings.get("auto_post_enabled", False)
+    
+    async def toggle_auto_post(self):
+        """Toggle auto-posting"""
+        def toggle(settings):
+            settings["auto_post_enabled"] = not settings.get("auto_post_enabled", False)
+        settings = await self._run(lambda conn: self._modify_settings(conn, toggle))
+        return settings["auto_post_enabled"]
+    
+    # ============ Posted Movies Operations ============
+    async def is_movie_posted(self, movie_id: str):
+        """Check if a movie has already been posted"""
+        return movie_id in await self.get_posted_movie_ids([movie_id])
+    
+    async def get_posted_movie_ids(self, movie_ids: list):
+        """Get the subset of movie IDs that have already been posted"""
+        if not movie_ids:
+            return set()
+        placeholders = ", ".join("?" for _ in movie_ids)
+        rows = await self._fetchall(
+            f"SELECT movie_id FROM posted_movies WHERE movie_id IN ({placeholders})",
+            tuple(movie_ids)
+        )
+        return {row["movie_id"] for row in rows}
+    
+    async def mark_movie_posted(self, movie_id: str, title: str):
+        """Mark a movie as posted"""
+        await self._execute(
+            "INSERT OR IGNORE INTO posted_movies (movie_id, title, posted_date) VALUES (?, ?, ?)",
+            (movie_id, title, datetime.now().isoformat())
+        )
+    
+    async def get_posted_count(self):
+        """Get total posted movies count"""
+        return (await self._fetchone("SELECT COUNT(*) FROM posted_movies"))[0]
+    
+    # ============ Stats Operations ============
+    async def recount_stats(self):
+        """Counts are always exact here, nothing to rebuild"""
+    
+    async def get_stats(self, estimated: bool = None):
+        """Get all stats counters and settings in one query"""
+        def stats(conn):
+            row = conn.execute(
+                "SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM admins), "
+                "(SELECT COUNT(*) FROM banned_users), (SELECT COUNT(*) FROM posted_movies)"
+            ).fetchone()
+            return {
+                "total_users": row[0],
+                "total_admins": row[1],
+                "banned_users": row[2],
+                "movies_posted": row[3],
+                "settings": self._read_settings(conn)
+            }
+        return await self._run(stats)
+    
+    # ============ Broadcast Job Operations ============
+    async def create_broadcast_job(self, from_chat_id: int, message_id: int, total: int,
+                                   status_chat_id: int = None, status_message_id: int = None,
+                                   sharded: bool = False, owner: str = None, lease_seconds: int = 0):
+        """Save a new broadcast job and return it (held by owner for lease_seconds, if given)"""
+        now = datetime.now().isoformat()
+        job = {
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "status_chat_id": status_chat_id,
+            "status_message_id": status_message_id,
+            "status": "queued",
+            "sharded": sharded,
+            "shards_ready": False,
+            "owner": owner,
+            "lease_until": time.time() + lease_seconds if owner else None,
+            "cursor": None,
+            "sent": 0,
+            "failed": 0,
+            "total": total,
+            "created_date": now,
+            "updated_date": now
+        }
+        
+        def create(conn):
+            return conn.execute(
+                "INSERT INTO broadcast_jobs (status, data) VALUES (?, ?)",
+                (job["status"], json.dumps(job))
+            ).lastrowid
+        
+        job["_id"] = await self._run(create)
+        return job
+    
+    async def update_broadcast_job(self, job_id, holder: str = None, **fields):
+        """
+        Update a broadcast job's checkpoint, counters or status
+        With holder, only while that process holds the job; returns False otherwise
+        """
+        fields["updated_date"] = datetime.now().isoformat()
+        
+        def update(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT data FROM broadcast_jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return False
+                job = json.loads(row["data"])
+                if holder and job.get("owner") != holder:
+                    return False
+                job.update(fields)
+                conn.execute(
+                    "UPDATE broadcast_jobs SET status = ?, data = ? WHERE id = ?",
+                    (job["status"], json.dumps(job), job_id)
+                )
+                return True
+        
+        return await self._run(update)
+    
+    async def claim_broadcast_job(self, job_id, worker_id: str, lease_seconds: int):
+        """Take or renew an unfinished job for lease_seconds; False if another process holds it"""
+        def claim(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT data FROM broadcast_jobs WHERE id = ? AND status IN ('queued', 'running', 'paused')",
+                    (job_id,)
+                ).fetchone()
+                if row is None:
+                    return False
+                job = json.loads(row["data"])
+                now = time.time()
+                if job.get("owner") not in (None, worker_id) and (job.get("lease_until") or 0) >= now:
+                    return False
+                job.update(owner=worker_id, lease_until=now + lease_seconds)
+                conn.execute("UPDATE broadcast_jobs SET data = ? WHERE id = ?", (json.dumps(job), job_id))
+                return True
+        
+        return await self._run(claim)
+    
+    async def get_unfinished_broadcast_jobs(self):
+        """Get broadcast jobs that have not finished, oldest first"""
+        rows = await self._fetchall(
+            "SELECT id, data FROM broadcast_jobs WHERE status IN ('queued', 'running', 'paused') ORDER BY id"
+        )
+        return [dict(json.loads(row["data"]), _id=row["id"]) for row in rows]
+    
+    async def get_broadcast_job(self, job_id):
+        """Get a broadcast job by its ID"""
+        row = await self._fetchone("SELECT id, data FROM broadcast_jobs WHERE id = ?", (job_id,))
+        return dict(json.loads(row["data"]), _id=row["id"]) if row else None
+    
+    async def add_broadcast_job_counts(self, job_id, sent: int = 0, failed: int = 0):
+        """Add results to a broadcast job's counters"""
+        def add(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT data FROM broadcast_jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return
+                job = json.loads(row["data"])
+                job["sent"] += sent
+                job["failed"] += failed
+                job["updated_date"] = datetime.now().isoformat()
+                conn.execute("UPDATE broadcast_jobs SET data = ? WHERE id = ?", (json.dumps(job), job_id))
+        
+        await self._run(add)
+    
+    # ============ API Cache Operations ============
+    async def setup_api_cache(self):
+        """Drop expired cached API responses"""
+        await self._execute("DELETE FROM api_cache WHERE expires_at <= ?", (time.time(),))
+    
+    async def get_api_cache(self, key: str):
+        """Get a cached API response if it has not expired"""
+        row = await self._fetchone(
+            "SELECT value FROM api_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        )
+        return json.loads(row["value"]) if row else None
+    
+    async def set_api_cache(self, key: str, value, ttl: int):
+        """Store an API response for ttl seconds"""
+        await self._execute(
+            "INSERT OR REPLACE INTO api_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl)
+        )
+    
+    # ============ Poster File Operations ============
+    async def get_poster_file_ids(self, poster_urls: list):
+        """Get the Telegram file_ids saved for a list of poster URLs"""
+        poster_urls = list(poster_urls)
+        if not poster_urls:
+            return {}
+        placeholders = ", ".join("?" for _ in poster_urls)
+        rows = await self._fetchall(
+            f"SELECT poster_url, file_id FROM poster_files WHERE poster_url IN ({placeholders})",
+            tuple(poster_urls)
+        )
+        return {row["poster_url"]: row["file_id"] for row in rows}
+    
+    async def set_poster_file_id(self, poster_url: str, file_id: str):
+        """Save the Telegram file_id of an uploaded poster"""
+        await self._execute(
+            "INSERT OR REPLACE INTO poster_files (poster_url, file_id, saved_date) VALUES (?, ?, ?)",
+            (poster_url, file_id, datetime.now().isoformat())
+        )
+    
+    async def delete_poster_file_id(self, poster_url: str):
+        """Forget a file_id that Telegram no longer accepts"""
+        await self._execute("DELETE FROM poster_files WHERE poster_url = ?", (poster_url,))
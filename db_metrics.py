@@ -0,0 +1,192 @@
+"""
+MongoDB Command Metrics for Poster Bot
+pymongo listeners that record command latency and connection pool waits
+"""
+
+import logging
+import threading
+from collections import deque
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds (last bucket catches the rest)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+# Commands whose first value is not a collection name
+COLLECTION_FIELDS = {"getMore": "collection"}
+
+
+class AmanbotzLatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, duration_ms: float):
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[index] += 1
+                break
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+    
+    def percentile(self, pct: float):
+        """Approximate a percentile by the upper bound of its bucket"""
+        if not self.count:
+            return None
+        target = pct / 100 * self.count
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= target:
+                bound = LATENCY_BUCKETS_MS[index]
+                return round(self.max_ms) if bound == float("inf") else bound
+        return round(self.max_ms)
+    
+    def stats(self):
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99)
+        }
+
+
+class AmanbotzCommandMetrics(monitoring.CommandListener):
+    def __init__(self, slow_ms: int = 100, slow_log_size: int = 20):
+        self.slow_ms = slow_ms
+        # Listeners are called from pymongo's worker threads
+        self._lock = threading.Lock()
+        # (request_id, connection_id) -> collection, until the reply arrives
+        self._pending = {}
+        # (collection, command) -> histogram
+        self.commands = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.pool = AmanbotzPoolMetrics()
+    
+    @staticmethod
+    def _collection_of(event):
+        field = COLLECTION_FIELDS.get(event.command_name, event.command_name)
+        value = event.command.get(field)
+        return value if isinstance(value, str) else event.database_name
+    
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = self._collection_of(event)
+    
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+    
+    def failed(self, event):
+        self._finish(event, failed=True)
+    
+    def _finish(self, event, failed: bool):
+        duration_ms = event.duration_micros / 1000
+        with self._lock:
+            collection = self._pending.pop((event.request_id, event.connection_id), event.database_name)
+            key = (collection, event.command_name)
+            histogram = self.commands.get(key)
+            if histogram is None:
+                histogram = self.commands[key] = AmanbotzLatencyHistogram()
+            histogram.record(duration_ms)
+            if failed:
+                histogram.failures += 1
+            
+            slow = duration_ms >= self.slow_ms
+            if slow:
+                self.slow_queries.append({
+                    "collection": collection,
+                    "command": event.command_name,
+                    "duration_ms": round(duration_ms, 1),
+                    "failed": failed
+                })
+        
+        if slow:
+            logger.warning(f"Slow MongoDB {event.command_name} on {collection}: {duration_ms:.1f}ms")
+    
+    def stats(self, top: int = None):
+        """Get per-collection/command latency, slowest total time first"""
+        with self._lock:
+            commands = [
+                dict(histogram.stats(), collection=collection, command=command)
+                for (collection, command), histogram in self.commands.items()
+            ]
+            slow_queries = list(self.slow_queries)
+        commands.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "commands": commands[:top] if top else commands,
+            "slow_queries": slow_queries,
+            "pool": self.pool.stats()
+        }
+
+
+class AmanbotzPoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = AmanbotzLatencyHistogram()
+        self.checkout_failures = 0
+        self.connections_open = 0
+        self.checked_out = 0
+    
+    def connection_checked_out(self, event):
+        # pymongo 4.7+ reports how long the checkout waited for a connection
+        duration = getattr(event, "duration", None)
+        with self._lock:
+            self.checked_out += 1
+            if duration is not None:
+                self.wait.record(duration * 1000)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def stats(self):
+        with self._lock:
+            stats = self.wait.stats()
+            return {
+                "checkouts": stats["count"],
+                "wait_avg_ms": stats["avg_ms"],
+                "wait_p95_ms": stats["p95_ms"],
+                "wait_max_ms": stats["max_ms"],
+                "checkout_failures": self.checkout_failures,
+                "connections_open": self.connections_open,
+                "in_use": self.checked_out
+            }
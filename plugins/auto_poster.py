@@ -8,44 +8,64 @@ import asyncio
 import logging
 from api import amanbotz_api
 from database import amanbotz_db
+from poster_files import amanbotz_poster_files
+from progress import AmanbotzProgressReporter
 from script import AMANBOTZ_AUTO_POST_MESSAGE
 
 logger = logging.getLogger(__name__)
 
 
-async def check_and_post_releases(client):
+async def release_pages(releases: list = None):
+    """Yield the given releases as one page, or stream pages from the API"""
+    if releases is not None:
+        yield releases
+        return
+    async for page in amanbotz_api.iter_new_release_pages():
+        yield page
+
+
+async def iter_unposted_releases(releases: list = None, already_filtered: bool = False):
+    """
+    Yield new releases that haven't been posted yet
+    Checks each page of releases against the database in one query,
+    unless already_filtered says the given releases were checked by the caller
+    """
+    async for page in release_pages(releases):
+        if already_filtered and releases is not None:
+            posted_ids = set()
+        else:
+            posted_ids = await amanbotz_db.get_posted_movie_ids([release["id"] for release in page])
+        for release in page:
+            if release["id"] not in posted_ids:
+                yield release
+
+
+async def check_and_post_releases(client, releases: list = None, on_progress=None, already_filtered: bool = False):
     """
     Check for new releases and post to channel
     This is called by the scheduler in the main bot file
+    Pass releases to post an already fetched list instead of fetching again
+    (with already_filtered if posted releases were already dropped from it)
+    on_progress(posted_count, title) is called after each post
+    Returns the number of releases posted
     """
+    posted_count = 0
     try:
         # Check if auto-posting is enabled
         if not await amanbotz_db.is_auto_post_enabled():
             logger.info("Auto-posting is disabled, skipping...")
-            return
+            return posted_count
         
         # Get the channel ID
         channel_id = await amanbotz_db.get_auto_post_channel()
         if not channel_id:
             logger.info("No auto-post channel set, skipping...")
-            return
+            return posted_count
         
         logger.info("Fetching new releases...")
         
-        # Get new releases from API
-        releases = await amanbotz_api.get_new_releases()
-        
-        if not releases:
-            logger.info("No releases found or API unavailable")
-            return
-        
-        posted_count = 0
-        
-        for release in releases:
-            # Check if already posted
-            if await amanbotz_db.is_movie_posted(release["id"]):
-                continue
-            
+        # Stream unposted releases, posting as each page arrives
+        async for release in iter_unposted_releases(releases, already_filtered):
             # Skip if no poster
             if not release.get("poster"):
                 continue
@@ -65,9 +85,10 @@ async def check_and_post_releases(client):
                 )
                 
                 # Send the poster to channel
-                await client.send_photo(
+                await amanbotz_poster_files.send_poster(
+                    client.send_photo,
+                    release["poster"],
                     chat_id=channel_id,
-                    photo=release["poster"],
                     caption=message,
                     parse_mode="HTML"
                 )
@@ -76,6 +97,8 @@ async def check_and_post_releases(client):
                 await amanbotz_db.mark_movie_posted(release["id"], release["title"])
                 posted_count += 1
                 logger.info(f"Posted: {release['title']}")
+                if on_progress:
+                    on_progress(posted_count, release["title"])
                 
                 # Delay to avoid rate limiting
                 await asyncio.sleep(3)
@@ -88,6 +111,8 @@ async def check_and_post_releases(client):
         
     except Exception as e:
         logger.error(f"Error in auto-post task: {e}")
+    
+    return posted_count
 
 
 async def manual_post_check(client, message):
@@ -131,10 +156,9 @@ async def manual_post_check(client, message):
             return
         
         # Count new releases
-        new_count = 0
-        for release in releases:
-            if not await amanbotz_db.is_movie_posted(release["id"]):
-                new_count += 1
+        posted_ids = await amanbotz_db.get_posted_movie_ids([release["id"] for release in releases])
+        new_releases = [release for release in releases if release["id"] not in posted_ids]
+        new_count = len(new_releases)
         
         if new_count == 0:
             await status.edit_text(
@@ -144,19 +168,23 @@ async def manual_post_check(client, message):
             )
             return
         
-        await status.edit_text(
+        # Post releases, showing progress without flooding edits
+        reporter = AmanbotzProgressReporter(lambda text: status.edit_text(text, parse_mode="HTML"))
+        reporter.update(
             f"<b>📤 Found {new_count} new releases!</b>\n"
-            "<i>Posting to channel...</i>",
-            parse_mode="HTML"
+            "<i>Posting to channel...</i>"
         )
         
-        # Post releases
-        await check_and_post_releases(client)
+        def on_progress(posted: int, title: str):
+            reporter.update(
+                f"<b>📤 Posting {new_count} new releases...</b>\n"
+                f"✅ <b>Posted:</b> {posted}/{new_count}\n"
+                f"🎬 <b>Last:</b> {title}"
+            )
         
-        await status.edit_text(
-            f"<b>✅ Posted {new_count} new releases!</b>",
-            parse_mode="HTML"
-        )
+        posted_count = await check_and_post_releases(client, new_releases, on_progress, already_filtered=True)
+        
+        await reporter.finish(f"<b>✅ Posted {posted_count} of {new_count} new releases!</b>")
         
     except Exception as e:
         await message.reply_text(
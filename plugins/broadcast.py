@@ -3,18 +3,17 @@ Broadcast Handler
 Send messages to all users (Owner only)
 """
 
-import asyncio
 from pyrogram import Client, filters
 from pyrogram.types import Message
-from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated
 from database import amanbotz_db
-from config import AMANBOTZ_OWNER_ID
+from broadcaster import amanbotz_broadcasts, SHARDING_ENABLED
+from config import AMANBOTZ_OWNER_ID, AMANBOTZ_BROADCAST_LEASE, AMANBOTZ_WORKER_ID
 from script import (
     AMANBOTZ_ERROR_BANNED,
     AMANBOTZ_ERROR_OWNER_ONLY,
     AMANBOTZ_BROADCAST_START,
-    AMANBOTZ_BROADCAST_PROGRESS,
-    AMANBOTZ_BROADCAST_COMPLETE
+    AMANBOTZ_BROADCAST_QUEUED,
+    AMANBOTZ_BROADCAST_JOB
 )
 
 
@@ -49,9 +48,8 @@ async def broadcast_command(client: Client, message: Message):
     # Get the message to broadcast
     broadcast_msg = message.reply_to_message
     
-    # Get all users
-    users = await amanbotz_db.get_all_users()
-    total_users = len(users)
+    # Read the maintained user counter (IDs are streamed below instead of loaded at once)
+    total_users = (await amanbotz_db.get_stats())["total_users"]
     
     if total_users == 0:
         await message.reply_text(
@@ -60,62 +58,89 @@ async def broadcast_command(client: Client, message: Message):
         )
         return
     
-    # Start broadcast
+    # Status message, updated with progress once the job starts
     status_msg = await message.reply_text(
         AMANBOTZ_BROADCAST_START,
         parse_mode="HTML"
     )
     
-    sent = 0
-    failed = 0
-    
-    for i, target_user_id in enumerate(users):
-        try:
-            # Copy the message to user
-            await broadcast_msg.copy(chat_id=target_user_id)
-            sent += 1
-            
-        except FloodWait as e:
-            # Wait for flood
-            await asyncio.sleep(e.value)
-            try:
-                await broadcast_msg.copy(chat_id=target_user_id)
-                sent += 1
-            except Exception:
-                failed += 1
-                
-        except (UserIsBlocked, InputUserDeactivated):
-            # User blocked bot or deactivated
-            failed += 1
-            # Optionally remove from database
-            await amanbotz_db.delete_user(target_user_id)
-            
-        except Exception:
-            failed += 1
-        
-        # Update progress every 20 users
-        if (i + 1) % 20 == 0:
-            try:
-                await status_msg.edit_text(
-                    AMANBOTZ_BROADCAST_PROGRESS.format(
-                        sent=sent,
-                        failed=failed,
-                        total=total_users
-                    ),
-                    parse_mode="HTML"
-                )
-            except Exception:
-                pass
-        
-        # Small delay to avoid rate limiting
-        await asyncio.sleep(0.05)
-    
-    # Final update
+    # Save the broadcast as a job so a restart resumes it from its checkpoint,
+    # held by this process so other replicas leave it alone until it is running
+    # (a sharded job is split into user ID ranges that any worker process can lease)
+    job = await amanbotz_db.create_broadcast_job(
+        from_chat_id=broadcast_msg.chat.id,
+        message_id=broadcast_msg.id,
+        total=total_users,
+        status_chat_id=status_msg.chat.id,
+        status_message_id=status_msg.id,
+        sharded=SHARDING_ENABLED,
+        owner=AMANBOTZ_WORKER_ID,
+        lease_seconds=AMANBOTZ_BROADCAST_LEASE
+    )
+    
+    # Run (or split) it in the background so this handler returns right away
+    job_id = amanbotz_broadcasts.submit(client, job)
     await status_msg.edit_text(
-        AMANBOTZ_BROADCAST_COMPLETE.format(
-            sent=sent,
-            failed=failed,
-            total=total_users
-        ),
+        AMANBOTZ_BROADCAST_QUEUED.format(job_id=job_id, total=total_users),
+        parse_mode="HTML"
+    )
+
+
+@Client.on_message(filters.command("broadcasts") & filters.private)
+async def broadcasts_command(client: Client, message: Message):
+    """Handle /broadcasts command - Owner only"""
+    user_id = message.from_user.id
+    
+    # Check if user is owner
+    if not is_owner(user_id):
+        await message.reply_text(AMANBOTZ_ERROR_OWNER_ONLY, parse_mode="HTML")
+        return
+    
+    jobs = await amanbotz_broadcasts.list_jobs()
+    if not jobs:
+        await message.reply_text(
+            "<b>📢 No broadcasts running.</b>",
+            parse_mode="HTML"
+        )
+        return
+    
+    lines = [AMANBOTZ_BROADCAST_JOB.format(**job) for job in jobs]
+    await message.reply_text(
+        "<b>📢 Broadcasts</b>\n\n" + "\n\n".join(lines),
+        parse_mode="HTML"
+    )
+
+
+@Client.on_message(filters.command(["pausebroadcast", "resumebroadcast", "cancelbroadcast"]) & filters.private)
+async def broadcast_control_command(client: Client, message: Message):
+    """Handle /pausebroadcast, /resumebroadcast and /cancelbroadcast - Owner only"""
+    user_id = message.from_user.id
+    
+    # Check if user is owner
+    if not is_owner(user_id):
+        await message.reply_text(AMANBOTZ_ERROR_OWNER_ONLY, parse_mode="HTML")
+        return
+    
+    actions = {
+        "pausebroadcast": (amanbotz_broadcasts.pause, "⏸ Broadcast paused"),
+        "resumebroadcast": (amanbotz_broadcasts.resume, "▶️ Broadcast resumed"),
+        "cancelbroadcast": (amanbotz_broadcasts.cancel, "🛑 Broadcast cancelled")
+    }
+    action, title = actions[message.command[0].lower()]
+    
+    # The job ID may be left out when only one broadcast is running
+    job_ref = message.command[1] if len(message.command) > 1 else None
+    job = await action(job_ref)
+    
+    if job is None:
+        await message.reply_text(
+            f"<b>⚠️ Broadcast not found!</b>\n\nUse <code>/broadcasts</code> to see job IDs, "
+            f"then <code>/{message.command[0]} [job_id]</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    await message.reply_text(
+        f"<b>{title}!</b>\n\n" + AMANBOTZ_BROADCAST_JOB.format(**job),
         parse_mode="HTML"
     )
@@ -3,10 +3,13 @@ Movie Search Handler
 Search for movies and get posters with details
 """
 
+import asyncio
 from pyrogram import Client, filters, enums
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database import amanbotz_db
 from api import amanbotz_api
+from poster_files import amanbotz_poster_files
+from config import AMANBOTZ_PREFETCH_TOP_K, AMANBOTZ_PREFETCH_CONCURRENCY
 from script import (
     AMANBOTZ_MOVIE_DETAILS_OMDB,
     AMANBOTZ_MOVIE_DETAILS_TMDB,
@@ -19,8 +22,51 @@ from script import (
 # Store user search sessions
 user_search_sessions = {}
 
+# Background detail prefetches, one per search session
+user_prefetch_tasks = {}
 
-@Client.on_message(filters.private & filters.text & ~filters.command(["start", "help", "ban", "unban", "addadmin", "removeadmin", "admins", "broadcast", "setchannel", "toggleauto", "settings", "stats"]))
+
+async def prefetch_details(movies: list, source: str):
+    """Warm the details cache for the top search results"""
+    semaphore = asyncio.Semaphore(AMANBOTZ_PREFETCH_CONCURRENCY)
+    
+    async def warm(movie):
+        movie_id = movie.get("imdbID") if source == "omdb" else movie.get("id")
+        if not movie_id:
+            return
+        async with semaphore:
+            try:
+                await amanbotz_api.prefetch_movie_details(movie_id, source)
+            except Exception:
+                pass
+    
+    await asyncio.gather(*(warm(movie) for movie in movies[:AMANBOTZ_PREFETCH_TOP_K]))
+
+
+def cancel_prefetch(user_id: int):
+    """Stop the prefetch for a user's previous search session"""
+    task = user_prefetch_tasks.pop(user_id, None)
+    if task and not task.done():
+        task.cancel()
+
+
+def start_prefetch(user_id: int, movies: list, source: str):
+    """Start a background prefetch for a user's search session"""
+    cancel_prefetch(user_id)
+    if AMANBOTZ_PREFETCH_TOP_K <= 0:
+        return
+    
+    task = asyncio.create_task(prefetch_details(movies, source))
+    user_prefetch_tasks[user_id] = task
+    
+    def _forget(done):
+        if user_prefetch_tasks.get(user_id) is done:
+            del user_prefetch_tasks[user_id]
+    
+    task.add_done_callback(_forget)
+
+
+@Client.on_message(filters.private & filters.text & ~filters.command(["start", "help", "ban", "unban", "addadmin", "removeadmin", "admins", "broadcast", "broadcasts", "pausebroadcast", "resumebroadcast", "cancelbroadcast", "setchannel", "toggleauto", "settings", "stats"]))
 async def search_movie(client: Client, message: Message):
     """Handle movie search by text message"""
     user_id = message.from_user.id
@@ -34,6 +80,9 @@ async def search_movie(client: Client, message: Message):
         )
         return
     
+    # Track activity (written in the background)
+    amanbotz_db.queue_user(user_id, register=False)
+    
     # Ignore short queries
     if len(query) < 2:
         return
@@ -69,6 +118,9 @@ async def search_movie(client: Client, message: Message):
         "query": query
     }
     
+    # The old session's prefetch is no longer useful
+    cancel_prefetch(user_id)
+    
     # Format results
     if source == "omdb":
         results_text = "\n".join([
@@ -103,6 +155,9 @@ async def search_movie(client: Client, message: Message):
         parse_mode=enums.ParseMode.HTML,
         reply_markup=keyboard
     )
+    
+    # Fetch the likely picks while the user reads the list
+    start_prefetch(user_id, movies, source)
 
 
 async def handle_selection(client: Client, message: Message, selection: int):
@@ -158,7 +213,7 @@ async def send_movie_details(client: Client, message: Message, movie: dict, sour
         if source == "omdb":
             # Get full details from OMDB
             movie_id = movie.get("imdbID")
-            details = await amanbotz_api.omdb_get_movie(imdb_id=movie_id)
+            details = await amanbotz_api.get_movie_details(movie_id=movie_id, source="omdb")
             
             if not details:
                 await message.reply_text(AMANBOTZ_ERROR_API, parse_mode=enums.ParseMode.HTML)
@@ -187,7 +242,7 @@ async def send_movie_details(client: Client, message: Message, movie: dict, sour
         else:  # tmdb
             # Get full details from TMDB
             movie_id = movie.get("id")
-            details = await amanbotz_api.tmdb_get_movie(movie_id)
+            details = await amanbotz_api.get_movie_details(movie_id=movie_id, source="tmdb")
             
             if not details:
                 await message.reply_text(AMANBOTZ_ERROR_API, parse_mode=enums.ParseMode.HTML)
@@ -222,15 +277,17 @@ async def send_movie_details(client: Client, message: Message, movie: dict, sour
         if poster_url and poster_url != "N/A":
             try:
                 if is_callback:
-                    await message.reply_photo(
-                        photo=poster_url,
+                    await amanbotz_poster_files.send_poster(
+                        message.reply_photo,
+                        poster_url,
                         caption=caption,
                         parse_mode=enums.ParseMode.HTML,
                         reply_markup=keyboard
                     )
                 else:
-                    await message.reply_photo(
-                        photo=poster_url,
+                    await amanbotz_poster_files.send_poster(
+                        message.reply_photo,
+                        poster_url,
                         caption=caption,
                         parse_mode=enums.ParseMode.HTML,
                         reply_markup=keyboard
@@ -6,7 +6,8 @@ Impressive welcome page with random movie poster
 from pyrogram import Client, filters, enums
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database import amanbotz_db
-from api import amanbotz_api
+from poster_pool import amanbotz_poster_pool
+from poster_files import amanbotz_poster_files
 from config import AMANBOTZ_OWNER_ID
 from script import AMANBOTZ_START_MESSAGE, AMANBOTZ_ERROR_BANNED
 
@@ -26,11 +27,11 @@ async def start_command(client: Client, message: Message):
         )
         return
     
-    # Add user to database
-    await amanbotz_db.add_user(user_id, username, first_name)
+    # Add user to database (written in the background)
+    amanbotz_db.queue_user(user_id, username, first_name)
     
-    # Get random movie poster
-    random_movie = await amanbotz_api.get_random_poster()
+    # Get random movie poster from the pre-warmed pool
+    random_movie = await amanbotz_poster_pool.get()
     
     # Create keyboard
     keyboard = InlineKeyboardMarkup([
@@ -54,8 +55,9 @@ async def start_command(client: Client, message: Message):
         )
         
         try:
-            await message.reply_photo(
-                photo=random_movie["poster"],
+            await amanbotz_poster_files.send_poster(
+                message.reply_photo,
+                random_movie["poster"],
                 caption=caption,
                 parse_mode=enums.ParseMode.HTML,
                 reply_markup=keyboard
@@ -95,8 +97,8 @@ async def start_callback(client: Client, callback_query):
         await callback_query.answer("You are banned!", show_alert=True)
         return
     
-    # Get random movie poster
-    random_movie = await amanbotz_api.get_random_poster()
+    # Get random movie poster from the pre-warmed pool
+    random_movie = await amanbotz_poster_pool.get()
     
     keyboard = InlineKeyboardMarkup([
         [
@@ -118,8 +120,10 @@ async def start_callback(client: Client, callback_query):
         )
         
         try:
+            # Prefer the already uploaded photo
+            file_id = await amanbotz_poster_files.get(random_movie["poster"])
             await callback_query.message.edit_media(
-                media=dict(type="photo", media=random_movie["poster"]),
+                media=dict(type="photo", media=file_id or random_movie["poster"]),
                 reply_markup=keyboard
             )
             await callback_query.message.edit_caption(
@@ -6,6 +6,7 @@ View bot statistics (Owner only)
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database import amanbotz_db
+from api import amanbotz_api
 from config import AMANBOTZ_OWNER_ID
 from script import AMANBOTZ_ERROR_BANNED, AMANBOTZ_ERROR_OWNER_ONLY, AMANBOTZ_STATS_MESSAGE
 
@@ -15,6 +16,63 @@ def is_owner(user_id: int) -> bool:
     return user_id == AMANBOTZ_OWNER_ID
 
 
+def get_api_health_text() -> str:
+    """Format breaker state, latency percentiles and rate limiter queues for each API"""
+    state_icons = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+    limits = amanbotz_api.get_rate_limit_stats()
+    lines = []
+    for provider, health in amanbotz_api.get_health_stats().items():
+        icon = state_icons.get(health["state"], "⚪")
+        if health["p50_ms"] is None:
+            latency = "<i>no calls yet</i>"
+        else:
+            latency = f"p50 {health['p50_ms']}ms · p95 {health['p95_ms']}ms · p99 {health['p99_ms']}ms"
+        lines.append(f"{icon} <b>{provider.upper()}:</b> {health['state'].replace('_', '-')} | {latency}")
+        limit = limits.get(provider)
+        if limit:
+            lines.append(
+                f"   ⏳ {limit['rate']}/s · queue {limit['queue_depth']} | "
+                f"wait avg {limit['avg_wait_ms']}ms · max {limit['max_wait_ms']}ms · "
+                f"{limit['throttled']} throttled · {limit['timeouts']} timed out"
+            )
+    return "\n".join(lines) if lines else "<i>No API configured</i>"
+
+
+def get_api_cache_text() -> str:
+    """Format response cache hit rate, size and evictions"""
+    cache = amanbotz_api.get_cache_stats()
+    return (
+        f"• <b>Memory:</b> {cache['hits']} hits · {cache['misses']} misses "
+        f"({cache['hit_rate'] * 100:.0f}%) | {cache['entries']} entries · {cache['evictions']} evicted\n"
+        f"• <b>Store:</b> {cache['store_hits']} hits · {cache['store_misses']} misses | "
+        f"{cache['coalesced_calls']} coalesced"
+    )
+
+
+def get_db_health_text(top: int = 5) -> str:
+    """Format the MongoDB commands with the most total time and pool waits"""
+    stats = amanbotz_db.get_command_stats(top)
+    if stats is None:
+        return "<i>Not available</i>"
+    if not stats["commands"]:
+        return "<i>No commands yet</i>"
+    
+    lines = []
+    for entry in stats["commands"]:
+        lines.append(
+            f"• <b>{entry['collection']}.{entry['command']}:</b> {entry['count']} calls | "
+            f"avg {entry['avg_ms']}ms · p95 {entry['p95_ms']}ms · total {entry['total_ms'] / 1000:.1f}s"
+        )
+    pool = stats["pool"]
+    lines.append(
+        f"🔌 <b>Pool:</b> {pool['in_use']}/{pool['connections_open']} in use | "
+        f"wait avg {pool['wait_avg_ms']}ms · max {pool['wait_max_ms']}ms"
+    )
+    if stats["slow_queries"]:
+        lines.append(f"🐢 <b>Slow commands:</b> {len(stats['slow_queries'])} recent")
+    return "\n".join(lines)
+
+
 @Client.on_message(filters.command("stats") & filters.private)
 async def stats_command(client: Client, message: Message):
     """Handle /stats command - Owner only"""
@@ -30,14 +88,15 @@ async def stats_command(client: Client, message: Message):
         await message.reply_text(AMANBOTZ_ERROR_OWNER_ONLY, parse_mode="HTML")
         return
     
-    # Get statistics
-    total_users = await amanbotz_db.get_users_count()
-    banned_users = await amanbotz_db.get_banned_count()
-    total_admins = await amanbotz_db.get_admins_count()
-    movies_posted = await amanbotz_db.get_posted_count()
+    # Get statistics and settings in one query
+    stats = await amanbotz_db.get_stats()
+    total_users = stats["total_users"]
+    banned_users = stats["banned_users"]
+    total_admins = stats["total_admins"]
+    movies_posted = stats["movies_posted"]
     
     # Get auto-post status
-    settings = await amanbotz_db.get_settings()
+    settings = stats["settings"]
     auto_enabled = settings.get("auto_post_enabled", False)
     channel = settings.get("auto_post_channel", 0)
     
@@ -62,13 +121,36 @@ async def stats_command(client: Client, message: Message):
             total_admins=total_admins + 1,  # +1 for owner
             movies_posted=movies_posted,
             auto_status=auto_text,
-            channel=channel_text
+            channel=channel_text,
+            api_health=get_api_health_text(),
+            api_cache=get_api_cache_text(),
+            db_health=get_db_health_text()
         ),
         parse_mode="HTML",
         reply_markup=keyboard
     )
 
 
+@Client.on_message(filters.command("recount") & filters.private)
+async def recount_command(client: Client, message: Message):
+    """Handle /recount command - Owner only"""
+    if not is_owner(message.from_user.id):
+        await message.reply_text(AMANBOTZ_ERROR_OWNER_ONLY, parse_mode="HTML")
+        return
+    
+    status = await message.reply_text("🔄 <b>Recounting stats...</b>", parse_mode="HTML")
+    await amanbotz_db.recount_stats()
+    stats = await amanbotz_db.get_stats(estimated=False)
+    await status.edit_text(
+        f"✅ <b>Stats recounted</b>\n\n"
+        f"👥 Users: <code>{stats['total_users']}</code>\n"
+        f"🚫 Banned: <code>{stats['banned_users']}</code>\n"
+        f"👮 Admins: <code>{stats['total_admins']}</code>\n"
+        f"🎬 Posted: <code>{stats['movies_posted']}</code>",
+        parse_mode="HTML"
+    )
+
+
 @Client.on_callback_query(filters.regex("^refresh_stats$"))
 async def refresh_stats_callback(client: Client, callback_query):
     """Handle refresh stats callback"""
@@ -79,14 +161,15 @@ async def refresh_stats_callback(client: Client, callback_query):
         await callback_query.answer("Owner only!", show_alert=True)
         return
     
-    # Get statistics
-    total_users = await amanbotz_db.get_users_count()
-    banned_users = await amanbotz_db.get_banned_count()
-    total_admins = await amanbotz_db.get_admins_count()
-    movies_posted = await amanbotz_db.get_posted_count()
+    # Get statistics and settings in one query
+    stats = await amanbotz_db.get_stats()
+    total_users = stats["total_users"]
+    banned_users = stats["banned_users"]
+    total_admins = stats["total_admins"]
+    movies_posted = stats["movies_posted"]
     
     # Get auto-post status
-    settings = await amanbotz_db.get_settings()
+    settings = stats["settings"]
     auto_enabled = settings.get("auto_post_enabled", False)
     channel = settings.get("auto_post_channel", 0)
     
@@ -111,7 +194,10 @@ async def refresh_stats_callback(client: Client, callback_query):
                 total_admins=total_admins + 1,
                 movies_posted=movies_posted,
                 auto_status=auto_text,
-                channel=channel_text
+                channel=channel_text,
+                api_health=get_api_health_text(),
+                api_cache=get_api_cache_text(),
+                db_health=get_db_health_text()
             ),
             parse_mode="HTML",
             reply_markup=keyboard
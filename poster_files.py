@@ -0,0 +1,87 @@
+"""
+Poster File Cache for Poster Bot
+Maps poster URLs to Telegram file_ids so each poster is uploaded only once
+"""
+
+import logging
+from pyrogram.errors import BadRequest
+from cache import AmanbotzTTLCache
+from database import amanbotz_db
+
+logger = logging.getLogger(__name__)
+
+
+class AmanbotzPosterFileCache:
+    def __init__(self, db, max_entries: int = 5000):
+        self.db = db
+        # file_ids don't expire, the LRU just bounds memory
+        self.memory = AmanbotzTTLCache(max_entries=max_entries, default_ttl=7 * 24 * 3600)
+    
+    async def get(self, poster_url: str):
+        """Get the file_id for a poster URL, if it was uploaded before"""
+        file_ids = await self.get_many([poster_url])
+        return file_ids.get(poster_url)
+    
+    async def get_many(self, poster_urls: list):
+        """Get file_ids for several poster URLs in one query"""
+        found = {}
+        missing = []
+        for url in poster_urls:
+            file_id = self.memory.get(url)
+            if file_id:
+                found[url] = file_id
+            elif url:
+                missing.append(url)
+        
+        if missing:
+            try:
+                stored = await self.db.get_poster_file_ids(missing)
+            except Exception as e:
+                logger.warning(f"Poster file lookup failed: {e}")
+                stored = {}
+            for url, file_id in stored.items():
+                self.memory.set(url, file_id)
+            found.update(stored)
+        return found
+    
+    async def remember(self, poster_url: str, message):
+        """Save the file_id from a message we just sent"""
+        if not message or not getattr(message, "photo", None):
+            return
+        file_id = message.photo.file_id
+        if self.memory.get(poster_url) == file_id:
+            return
+        self.memory.set(poster_url, file_id)
+        try:
+            await self.db.set_poster_file_id(poster_url, file_id)
+        except Exception as e:
+            logger.warning(f"Poster file save failed: {e}")
+    
+    async def forget(self, poster_url: str):
+        """Drop a file_id that Telegram rejected"""
+        self.memory.delete(poster_url)
+        try:
+            await self.db.delete_poster_file_id(poster_url)
+        except Exception as e:
+            logger.warning(f"Poster file delete failed: {e}")
+    
+    async def send_poster(self, send_photo, poster_url: str, **kwargs):
+        """
+        Send a poster with send_photo (e.g. message.reply_photo),
+        reusing its file_id when we have one
+        """
+        file_id = await self.get(poster_url)
+        if file_id:
+            try:
+                return await send_photo(photo=file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Cached file_id rejected, re-uploading: {e}")
+                await self.forget(poster_url)
+        
+        sent = await send_photo(photo=poster_url, **kwargs)
+        await self.remember(poster_url, sent)
+        return sent
+
+
+# Create poster file cache instance
+amanbotz_poster_files = AmanbotzPosterFileCache(amanbotz_db)
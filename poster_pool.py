@@ -0,0 +1,78 @@
+"""
+Featured Poster Pool for Poster Bot
+Keeps ready-to-send posters in memory so /start never waits on an API
+"""
+
+import asyncio
+import logging
+import random
+from collections import deque
+from api import amanbotz_api
+from poster_files import amanbotz_poster_files
+from config import AMANBOTZ_POSTER_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class AmanbotzPosterPool:
+    def __init__(self, api, file_cache, size: int = 20):
+        self.api = api
+        self.file_cache = file_cache
+        # Ring buffer: new posters push out the oldest ones
+        self.posters = deque(maxlen=size)
+        self._refresh_lock = asyncio.Lock()
+    
+    def __len__(self):
+        return len(self.posters)
+    
+    def add(self, poster: dict):
+        """Add a poster unless it is already in the pool"""
+        if not poster or not poster.get("poster"):
+            return False
+        if any(entry["poster"] == poster["poster"] for entry in self.posters):
+            return False
+        self.posters.append(dict(poster))
+        return True
+    
+    def pick(self):
+        """Get a random poster from the pool"""
+        if not self.posters:
+            return None
+        return dict(random.choice(self.posters))
+    
+    async def refresh(self, count: int = None):
+        """Fetch fresh featured posters into the pool"""
+        if self._refresh_lock.locked():
+            return
+        async with self._refresh_lock:
+            count = count or self.posters.maxlen
+            semaphore = asyncio.Semaphore(4)
+            
+            async def fetch():
+                async with semaphore:
+                    try:
+                        return await self.api.get_random_poster()
+                    except Exception as e:
+                        logger.warning(f"Featured poster fetch failed: {e}")
+                        return None
+            
+            posters = await asyncio.gather(*(fetch() for _ in range(count)))
+            added = sum(1 for poster in posters if self.add(poster))
+            
+            # Load known file_ids so /start can send without a lookup
+            await self.file_cache.get_many([entry["poster"] for entry in self.posters])
+            logger.info(f"Poster pool refreshed: {added} new, {len(self.posters)} ready")
+    
+    async def get(self):
+        """Pick a poster, fetching one directly only if the pool is empty"""
+        poster = self.pick()
+        if poster:
+            return poster
+        
+        poster = await self.api.get_random_poster()
+        self.add(poster)
+        return poster
+
+
+# Create poster pool instance
+amanbotz_poster_pool = AmanbotzPosterPool(amanbotz_api, amanbotz_poster_files, AMANBOTZ_POSTER_POOL_SIZE)
@@ -0,0 +1,75 @@
+"""
+Progress Reporter for Poster Bot
+Keeps a status message up to date without flooding Telegram with edits
+"""
+
+import asyncio
+import logging
+import time
+from pyrogram.errors import FloodWait, MessageNotModified
+from config import AMANBOTZ_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class AmanbotzProgressReporter:
+    def __init__(self, edit, min_interval: float = None):
+        # edit(text) is awaited to change the status message
+        self.edit = edit
+        self.min_interval = min_interval if min_interval is not None else AMANBOTZ_PROGRESS_INTERVAL
+        
+        self._pending = None
+        self._shown = None
+        self._edited_at = 0.0
+        self._task = None
+        
+        # Counters
+        self.updates = 0
+        self.edits = 0
+        self.flood_waits = 0
+    
+    def update(self, text: str):
+        """Set the latest text; it is shown on the next allowed edit"""
+        self.updates += 1
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        # Updates arriving while we wait replace each other, only the latest is sent
+        while True:
+            delay = self._edited_at + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._send(self._pending):
+                return
+    
+    async def _send(self, text: str):
+        """Edit the message unless it already shows this text; False on FloodWait"""
+        if text is None or text == self._shown:
+            return True
+        try:
+            await self.edit(text)
+        except FloodWait as e:
+            # Push the next edit back instead of hammering the limit
+            self.flood_waits += 1
+            self._edited_at = time.monotonic() + e.value
+            return False
+        except MessageNotModified:
+            pass
+        except Exception as e:
+            logger.debug(f"Progress edit failed: {e}")
+            return True
+        self.edits += 1
+        self._shown = text
+        self._edited_at = time.monotonic()
+        return True
+    
+    async def finish(self, text: str):
+        """Drop any pending update and show the final text, waiting out a FloodWait"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._pending = None
+        while not await self._send(text):
+            await asyncio.sleep(max(self._edited_at - time.monotonic(), 0))
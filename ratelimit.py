@@ -0,0 +1,108 @@
+"""
+Rate Limiter for Poster Bot
+Async token bucket that queues callers and adapts to provider throttling
+"""
+
+import asyncio
+import time
+
+
+class AmanbotzTokenBucket:
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.min_rate = min_rate or max(rate / 10, 0.1)
+        
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        
+        # Callers are served in arrival order
+        self._lock = asyncio.Lock()
+        
+        # Counters
+        self.waiting = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+    
+    async def _take(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    async def acquire(self, max_wait: float = None):
+        """Wait until a request may be sent; returns None if that takes longer than max_wait"""
+        started = time.monotonic()
+        if max_wait is not None and self.blocked_until - started > max_wait:
+            self.timeouts += 1
+            return None
+        
+        self.waiting += 1
+        try:
+            if max_wait is None:
+                await self._take()
+            else:
+                await asyncio.wait_for(self._take(), max_wait)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            self.waiting -= 1
+        
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+    
+    def set_base_rate(self, rate: float):
+        """Change the configured rate, e.g. when a shared budget is split differently"""
+        self.base_rate = rate
+        self.rate = min(self.rate, rate)
+        self.capacity = max(rate, 1)
+        self.min_rate = max(rate / 10, 0.1)
+        self.tokens = min(self.tokens, self.capacity)
+    
+    def on_throttled(self, retry_after: float = None):
+        """Provider pushed back: pause everyone and halve the rate"""
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        delay = retry_after if retry_after is not None else 1 / self.rate
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.tokens = 0
+    
+    def on_success(self):
+        """Creep back towards the configured rate"""
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+    
+    def stats(self):
+        """Get limiter counters"""
+        return {
+            "rate": round(self.rate, 2),
+            "base_rate": self.base_rate,
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 1) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
@@ -69,6 +69,10 @@ AMANBOTZ_ADMIN_HELP = """
 
 <b>📢 Broadcast:</b>
 • <code>/broadcast</code> - Reply to a message to broadcast
+• <code>/broadcasts</code> - List broadcasts with speed and ETA
+• <code>/pausebroadcast [job_id]</code> - Pause a broadcast
+• <code>/resumebroadcast [job_id]</code> - Resume a paused broadcast
+• <code>/cancelbroadcast [job_id]</code> - Cancel a broadcast
 
 <b>⚙️ Settings:</b>
 • <code>/setchannel [channel_id]</code> - Set auto-post channel
@@ -77,6 +81,7 @@ AMANBOTZ_ADMIN_HELP = """
 
 <b>📊 Statistics:</b>
 • <code>/stats</code> - View bot statistics
+• <code>/recount</code> - Rebuild the stats counters
 ━━━━━━━━━━━━━━━━━━━━━
 """
 
@@ -165,6 +170,18 @@ AMANBOTZ_STATS_MESSAGE = """
 ━━━━━━━━━━━━━━━━━━━━━
 ⚙️ <b>Auto-Post:</b> {auto_status}
 📢 <b>Channel:</b> {channel}
+
+━━━━━━━━━━━━━━━━━━━━━
+🌐 <b>API Health:</b>
+{api_health}
+
+━━━━━━━━━━━━━━━━━━━━━
+💾 <b>API Cache:</b>
+{api_cache}
+
+━━━━━━━━━━━━━━━━━━━━━
+🗄 <b>Database:</b>
+{db_health}
 ━━━━━━━━━━━━━━━━━━━━━
 """
 
@@ -186,9 +203,12 @@ AMANBOTZ_BROADCAST_START = "<b>📢 Starting Broadcast...</b>"
 AMANBOTZ_BROADCAST_PROGRESS = """
 <b>📢 Broadcast Progress</b>
 
+🆔 <b>Job:</b> <code>{job_id}</code> ({status})
 ✅ <b>Sent:</b> {sent}
 ❌ <b>Failed:</b> {failed}
 📊 <b>Total:</b> {total}
+⚡ <b>Speed:</b> {rate} msg/s
+⏳ <b>ETA:</b> {eta}
 """
 AMANBOTZ_BROADCAST_COMPLETE = """
 <b>✅ Broadcast Complete!</b>
@@ -197,7 +217,36 @@ AMANBOTZ_BROADCAST_COMPLETE = """
 ✅ Sent: {sent}
 ❌ Failed: {failed}
 📊 Total: {total}
+⚡ Speed: {rate} msg/s
+"""
+AMANBOTZ_BROADCAST_CANCELLED = """
+<b>🛑 Broadcast Cancelled!</b>
+
+📊 <b>Results:</b>
+✅ Sent: {sent}
+❌ Failed: {failed}
+📊 Total: {total}
+"""
+AMANBOTZ_BROADCAST_FAILED = """
+<b>⚠️ Broadcast Failed!</b>
+
+🆔 <b>Job:</b> <code>{job_id}</code>
+📊 <b>Results:</b>
+✅ Sent: {sent}
+❌ Failed: {failed}
+📊 Total: {total}
+
+<i>Check the logs, then send /broadcast again.</i>
+"""
+AMANBOTZ_BROADCAST_QUEUED = """
+<b>📢 Broadcast Queued!</b>
+
+🆔 <b>Job:</b> <code>{job_id}</code>
+📊 <b>Total:</b> {total}
+
+Use <code>/broadcasts</code> to follow it.
 """
+AMANBOTZ_BROADCAST_JOB = "🆔 <code>{job_id}</code> | {status}\n   ✅ {sent} ❌ {failed} / {total} | ⚡ {rate} msg/s | ⏳ {eta}"
 
 # Error Messages
 AMANBOTZ_ERROR_BANNED = """